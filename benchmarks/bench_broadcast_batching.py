@@ -0,0 +1,108 @@
+"""广播合并测试：全班学生在几秒内集中签到，统计每个客户端收到的帧数
+
+用法（在项目根目录下）:
+    python benchmarks/bench_broadcast_batching.py [--students 60] [--window-ms 100] [--spread-ms 2000]
+    python benchmarks/bench_broadcast_batching.py --window-ms 0   # 对比逐条发送
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# 固定使用 threading 模式：装有 eventlet 时 Flask-SocketIO 会自动选用它，但这里没有打猴子补丁，后台任务不会运行
+os.environ['CLASSROOM_ASYNC_MODE'] = 'threading'
+
+from app import app, broadcaster, get_db_connection, init_db, reset_db_pool, socketio
+
+
+def setup_classroom(student_count):
+    """创建教师、聊天室、学生和一次签到，返回 (聊天室ID, 学生ID列表, 签到ID)"""
+    conn = get_db_connection()
+    teacher_id = conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')").lastrowid
+    chatroom_id = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)',
+                               ('压测聊天室', teacher_id)).lastrowid
+    student_ids = [conn.execute("INSERT INTO users (name, role) VALUES (?, 'student')",
+                                (f'学生{i}',)).lastrowid
+                   for i in range(student_count)]
+    attendance_id = conn.execute('''
+        INSERT INTO attendance (chatroom_id, title, type) VALUES (?, '上课签到', 'normal')
+    ''', (chatroom_id,)).lastrowid
+    conn.commit()
+    conn.close()
+    return chatroom_id, student_ids, attendance_id
+
+
+def login(student_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = student_id
+        sess['user_name'] = f'学生{student_id}'
+        sess['user_role'] = 'student'
+    return client
+
+
+def sign(client, attendance_id, delay):
+    time.sleep(delay)
+    client.post('/api/attendance/sign', json={'attendance_id': attendance_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='集中签到时统计合并广播前后客户端收到的帧数')
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--window-ms', type=int, default=100)
+    parser.add_argument('--spread-ms', type=int, default=2000, help='所有学生在这段时间内随机签到')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        app.config['BROADCAST_BATCH_WINDOW_MS'] = args.window_ms
+        reset_db_pool()
+        init_db()
+
+        chatroom_id, student_ids, attendance_id = setup_classroom(args.students)
+        clients = [login(sid) for sid in student_ids]
+        sockets = [socketio.test_client(app, flask_test_client=client) for client in clients]
+        for sock in sockets:
+            sock.emit('join', {'chatroom_id': chatroom_id}, callback=True)
+        time.sleep(args.window_ms / 1000 + 0.2)
+        for sock in sockets:
+            sock.get_received()
+        before = broadcaster.stats()
+
+        threads = [threading.Thread(target=sign, args=(client, attendance_id,
+                                                       random.uniform(0, args.spread_ms / 1000)))
+                   for client in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        time.sleep(args.window_ms / 1000 + 0.2)
+
+        frames, records = [], []
+        for sock in sockets:
+            received = sock.get_received()
+            frames.append(len(received))
+            # 只统计签到记录，入场提示（presence）等其他事件不计入
+            records.append(sum(sum(item['event'] == 'new_attendance_record' for item in packet['args'][0])
+                               if packet['name'] == 'batch'
+                               else packet['name'] == 'new_attendance_record'
+                               for packet in received))
+            sock.disconnect()
+        after = broadcaster.stats()
+        reset_db_pool()
+
+    print(f'学生: {args.students}  合并窗口: {args.window_ms}ms  签到时间跨度: {args.spread_ms}ms')
+    print(f'每个客户端收到签到记录: {min(records)}~{max(records)} 条')
+    print(f'每个客户端收到帧数: 平均 {sum(frames) / len(frames):.1f}  最多 {max(frames)}')
+    print(f'全班共收到帧数: {sum(frames)}')
+    print(f'服务器统计: 事件 {after["events"] - before["events"]}  '
+          f'发送 {after["frames"] - before["frames"]}  '
+          f'客户端少收 {after["client_frames_saved"] - before["client_frames_saved"]} 帧')
+
+
+if __name__ == '__main__':
+    main()
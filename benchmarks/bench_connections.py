@@ -0,0 +1,157 @@
+"""并发连接负载测试：统计单个服务器进程能同时维持多少个WebSocket客户端
+
+通过 app_launcher.py 以指定异步模式启动服务器子进程（使用临时数据库），
+然后逐批建立学生连接并加入同一聊天室，最后由一名学生发送消息，
+测量消息广播到所有在线客户端所需的时间。
+需要安装: pip install "python-socketio[client]" requests
+
+用法（在项目根目录下）:
+    python benchmarks/bench_connections.py --async-mode eventlet --clients 500
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio as socketio_client
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_database(db_file, student_count):
+    """创建教师、聊天室和学生，返回 (聊天室ID, 学生ID列表)"""
+    import sqlite3
+    from app import init_db
+
+    init_db(db_file)
+    conn = sqlite3.connect(db_file)
+    teacher_id = conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')").lastrowid
+    chatroom_id = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)',
+                               ('压测聊天室', teacher_id)).lastrowid
+    student_ids = [conn.execute("INSERT INTO users (name, role) VALUES (?, 'student')",
+                                (f'学生{i}',)).lastrowid
+                   for i in range(student_count)]
+    conn.executemany('INSERT INTO chatroom_members (chatroom_id, user_id) VALUES (?, ?)',
+                     [(chatroom_id, sid) for sid in student_ids])
+    conn.commit()
+    conn.close()
+    return chatroom_id, student_ids
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(base_url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError('服务器未能启动')
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试单进程可维持的并发WebSocket连接数')
+    parser.add_argument('--async-mode', default='auto', choices=['auto', 'eventlet', 'gevent', 'threading'])
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=50, help='每批同时发起连接的客户端数')
+    parser.add_argument('--max-workers', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+        chatroom_id, student_ids = seed_database(db_file, args.clients)
+
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, CLASSROOM_DATABASE=db_file)
+        server = subprocess.Popen(
+            [sys.executable, 'app_launcher.py', '--no-browser', '--host', '127.0.0.1', '--port', str(port),
+             '--async-mode', args.async_mode, '--max-workers', str(args.max_workers)],
+            cwd=SRC_DIR, env=env, stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        clients = []
+        received = {}
+        received_lock = threading.Lock()
+        connect_times = []
+        failures = []
+
+        def connect(user_id):
+            try:
+                start = time.perf_counter()
+                http = requests.Session()
+                http.post(f'{base_url}/student/select_name',
+                          data={'user_id': user_id, 'chatroom_id': chatroom_id}, allow_redirects=False)
+                cookie = '; '.join(f'{k}={v}' for k, v in http.cookies.items())
+                client = socketio_client.Client(reconnection=False)
+
+                @client.on('new_message')
+                def on_message(data):
+                    with received_lock:
+                        received[user_id] = time.perf_counter()
+
+                client.connect(base_url, headers={'Cookie': cookie}, transports=['websocket'])
+                client.call('join', {'chatroom_id': chatroom_id}, timeout=60)
+                connect_times.append((time.perf_counter() - start) * 1000)
+                clients.append(client)
+            except Exception as e:
+                failures.append(repr(e))
+
+        try:
+            wait_for_server(base_url)
+
+            for i in range(0, len(student_ids), args.batch):
+                batch = [threading.Thread(target=connect, args=(sid,)) for sid in student_ids[i:i + args.batch]]
+                for t in batch:
+                    t.start()
+                for t in batch:
+                    t.join()
+                print(f'已连接 {len(clients)} / 失败 {len(failures)}')
+
+            # 等待 join 事件全部处理完毕后广播一条消息
+            time.sleep(2)
+            received.clear()
+            start = time.perf_counter()
+            clients[0].call('send_message', {'content': '广播测试', 'chatroom_id': chatroom_id})
+            deadline = time.time() + 30
+            while len(received) < len(clients) and time.time() < deadline:
+                time.sleep(0.01)
+            fanout = [(t - start) * 1000 for t in received.values()]
+
+            print(f'\n异步模式请求: {args.async_mode}  目标客户端: {args.clients}')
+            print(f'成功连接: {len(clients)}  失败: {len(failures)}')
+            print(f'建立连接(ms): p50={percentile(connect_times, 50):.0f} p95={percentile(connect_times, 95):.0f}')
+            print(f'广播送达: {len(received)}/{len(clients)}  '
+                  f'p50={percentile(fanout, 50):.0f}ms p99={percentile(fanout, 99):.0f}ms '
+                  f'max={max(fanout) if fanout else float("nan"):.0f}ms')
+            for failure in failures[:5]:
+                print('  ', failure)
+        finally:
+            closers = [threading.Thread(target=c.disconnect) for c in clients]
+            for t in closers:
+                t.start()
+            for t in closers:
+                t.join()
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""重复提交并发测试：同一名学生同时发出大量答题和签到请求，检查数据库中只留下一条记录
+
+用法（在项目根目录下）:
+    python benchmarks/bench_duplicate_submit.py [--requests 200]
+
+任一表中出现多于一条记录或成功响应不止一次时以退出码 1 结束。
+"""
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from app import app, get_db_connection, init_db, reset_db_pool
+
+
+def setup_classroom():
+    """创建教师、学生、聊天室、一道选择题和一次签到，返回 (学生ID, 题目ID, 签到ID)"""
+    conn = get_db_connection()
+    teacher_id = conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')").lastrowid
+    student_id = conn.execute("INSERT INTO users (name, role) VALUES ('学生', 'student')").lastrowid
+    chatroom_id = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)',
+                               ('并发测试聊天室', teacher_id)).lastrowid
+    question_id = conn.execute('''
+        INSERT INTO questions (chatroom_id, creator_id, title, content, type, options, answer)
+        VALUES (?, ?, '题目', '1+1=?', 'choice', '["1", "2"]', '1')
+    ''', (chatroom_id, teacher_id)).lastrowid
+    attendance_id = conn.execute('''
+        INSERT INTO attendance (chatroom_id, title, type) VALUES (?, '签到', 'normal')
+    ''', (chatroom_id,)).lastrowid
+    conn.commit()
+    conn.close()
+    return student_id, question_id, attendance_id
+
+
+def submit(student_id, url, payload, barrier, statuses):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = student_id
+        sess['user_name'] = '学生'
+        sess['user_role'] = 'student'
+
+    # 所有请求在同一时刻发出
+    barrier.wait()
+    try:
+        statuses.append(client.post(url, json=payload).status_code)
+    except Exception as e:
+        statuses.append(repr(e))
+
+
+def burst(count, student_id, url, payload):
+    barrier = threading.Barrier(count)
+    statuses = []
+    threads = [threading.Thread(target=submit, args=(student_id, url, payload, barrier, statuses))
+               for _ in range(count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return collections.Counter(statuses), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='同一学生并发重复提交答案和签到，检查是否只记录一次')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        app.config['RATE_LIMIT_ENABLED'] = False   # 让所有重复请求都到达数据库，检验唯一约束本身
+        reset_db_pool()
+        init_db()
+
+        student_id, question_id, attendance_id = setup_classroom()
+        cases = [
+            ('答题', '/api/question/answer', {'question_id': question_id, 'content': '1'},
+             'SELECT COUNT(*) FROM answers WHERE question_id = ? AND user_id = ?', question_id),
+            ('签到', '/api/attendance/sign', {'attendance_id': attendance_id},
+             'SELECT COUNT(*) FROM attendance_records WHERE attendance_id = ? AND user_id = ?', attendance_id),
+        ]
+
+        for name, url, payload, count_sql, target_id in cases:
+            statuses, elapsed = burst(args.requests, student_id, url, payload)
+            conn = get_db_connection()
+            rows = conn.execute(count_sql, (target_id, student_id)).fetchone()[0]
+            conn.close()
+
+            ok = rows == 1 and statuses[200] == 1
+            failed = failed or not ok
+            print(f'{name}: 请求 {args.requests} 次  耗时 {elapsed:.2f}s  '
+                  f'响应 {dict(statuses)}  记录数 {rows}  {"通过" if ok else "失败"}')
+
+        reset_db_pool()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""数据库索引基准测试：对比迁移前后高频查询的延迟
+
+用法（在项目根目录下）:
+    python benchmarks/bench_indexes.py [--messages 1000000]
+
+迁移前为最初的表结构（版本0，没有任何迁移添加的索引和列），写入数据后执行全部迁移再测一次。
+写法随迁移改变的查询（如私人消息按会话键读取）在迁移前后分别使用当时 app.py 中的写法。
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# 固定使用 threading 模式，避免导入 app 时自动选用未打猴子补丁的 eventlet
+os.environ['CLASSROOM_ASYNC_MODE'] = 'threading'
+
+from app import init_db, migrate_db
+
+STUDENTS = 60
+CHATROOMS = 20
+QUESTIONS = 2000
+ATTENDANCES = 500
+
+# 待测的高频查询（与 app.py 中的查询保持一致）：名称 -> (SQL, 参数生成函数)
+QUERIES = {
+    '公共消息分页': ('''
+        SELECT m.*, u.name as sender_name FROM messages m
+        JOIN users u ON m.sender_id = u.id
+        WHERE m.chatroom_id = ? AND m.type = 'public'
+        ORDER BY m.id DESC LIMIT 50
+    ''', lambda: (random.randint(1, CHATROOMS),)),
+    '聊天室成员': ('''
+        SELECT u.* FROM users u
+        JOIN chatroom_members cm ON u.id = cm.user_id
+        WHERE cm.chatroom_id = ?
+    ''', lambda: (random.randint(1, CHATROOMS),)),
+    '重复答题检查': ('''
+        SELECT * FROM answers WHERE question_id = ? AND user_id = ?
+    ''', lambda: (random.randint(1, QUESTIONS), random.randint(2, STUDENTS + 1))),
+    '重复签到检查': ('''
+        SELECT * FROM attendance_records WHERE attendance_id = ? AND user_id = ?
+    ''', lambda: (random.randint(1, ATTENDANCES), random.randint(2, STUDENTS + 1))),
+}
+
+# 迁移后写法改变的查询：名称 -> (迁移前的SQL, 迁移后的SQL, 参数生成函数)；迁移前没有对应查询时为 None
+CHANGED_QUERIES = {
+    '私人消息分页': ('''
+        SELECT m.* FROM messages m
+        WHERE m.chatroom_id = :room AND m.type = 'private'
+        AND (m.sender_id = :user OR m.receiver_id = :user)
+        ORDER BY m.id DESC LIMIT 50
+    ''', '''
+        SELECT m.* FROM messages m
+        WHERE m.conversation_key IN (
+            SELECT conversation_key FROM private_conversations WHERE user_id = :user AND chatroom_id = :room
+        )
+        ORDER BY m.id DESC LIMIT 50
+    ''', lambda: {'room': random.randint(1, CHATROOMS), 'user': random.randint(2, STUDENTS + 1)}),
+    '单个私聊会话': (None, '''
+        SELECT m.* FROM messages m
+        WHERE m.conversation_key = :room || ':1:' || :user
+        ORDER BY m.id DESC LIMIT 50
+    ''', lambda: {'room': random.randint(1, CHATROOMS), 'user': random.randint(2, STUDENTS + 1)}),
+}
+
+
+def populate(conn, message_count):
+    """写入测试数据"""
+    conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')")
+    conn.executemany('INSERT INTO users (name, role) VALUES (?, ?)',
+                     ((f'学生{i}', 'student') for i in range(STUDENTS)))
+    conn.executemany('INSERT INTO chatrooms (name, creator_id) VALUES (?, 1)',
+                     ((f'聊天室{i}',) for i in range(CHATROOMS)))
+    conn.executemany('INSERT INTO chatroom_members (chatroom_id, user_id) VALUES (?, ?)',
+                     ((room, user) for room in range(1, CHATROOMS + 1)
+                      for user in range(2, STUDENTS + 2)))
+
+    def messages():
+        for i in range(message_count):
+            sender = random.randint(1, STUDENTS + 1)
+            if i % 10 == 0:
+                yield (sender, random.randint(1, STUDENTS + 1), random.randint(1, CHATROOMS), f'私信{i}', 'private')
+            else:
+                yield (sender, None, random.randint(1, CHATROOMS), f'消息{i}', 'public')
+
+    conn.executemany('''
+        INSERT INTO messages (sender_id, receiver_id, chatroom_id, content, type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', messages())
+    conn.executemany('''
+        INSERT INTO questions (chatroom_id, creator_id, title, content, type)
+        VALUES (?, 1, ?, ?, 'open')
+    ''', ((random.randint(1, CHATROOMS), f'题目{i}', '内容') for i in range(QUESTIONS)))
+    conn.executemany('INSERT INTO answers (question_id, user_id, content) VALUES (?, ?, ?)',
+                     ((q, u, '答案') for q in range(1, QUESTIONS + 1) for u in range(2, STUDENTS + 2)))
+    conn.executemany("INSERT INTO attendance (chatroom_id, title, type) VALUES (?, ?, 'click')",
+                     ((random.randint(1, CHATROOMS), f'签到{i}') for i in range(ATTENDANCES)))
+    conn.executemany('INSERT INTO attendance_records (attendance_id, user_id) VALUES (?, ?)',
+                     ((a, u) for a in range(1, ATTENDANCES + 1) for u in range(2, STUDENTS + 2)))
+    conn.commit()
+
+
+def measure(conn, iterations, migrated):
+    """返回每个查询的平均延迟（毫秒），迁移前没有对应查询的不在结果中"""
+    queries = {name: (sql, params) for name, (sql, params) in QUERIES.items()}
+    for name, (sql_before, sql_after, params) in CHANGED_QUERIES.items():
+        sql = sql_after if migrated else sql_before
+        if sql is not None:
+            queries[name] = (sql, params)
+
+    results = {}
+    for name, (sql, params) in queries.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            conn.execute(sql, params()).fetchall()
+        results[name] = (time.perf_counter() - start) * 1000 / iterations
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比迁移前后高频查询的延迟')
+    parser.add_argument('--messages', type=int, default=1000000, help='消息表行数')
+    parser.add_argument('--iterations', type=int, default=50, help='每个查询的执行次数')
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+
+        # 先建出最初的表结构（不执行任何迁移）
+        init_db(db_file, schema_version=0)
+        conn = sqlite3.connect(db_file)
+
+        print(f'写入 {args.messages} 条消息...')
+        populate(conn, args.messages)
+
+        before = measure(conn, args.iterations, migrated=False)
+
+        start = time.perf_counter()
+        migrate_db(conn)
+        print(f'迁移耗时: {time.perf_counter() - start:.2f}s')
+
+        after = measure(conn, args.iterations, migrated=True)
+        conn.close()
+
+    print(f'\n{"查询":<12}{"迁移前(ms)":>14}{"迁移后(ms)":>14}{"加速":>10}')
+    for name, after_ms in after.items():
+        if name in before:
+            print(f'{name:<12}{before[name]:>14.3f}{after_ms:>14.3f}{before[name] / after_ms:>9.1f}x')
+        else:
+            print(f'{name:<12}{"-":>14}{after_ms:>14.3f}{"-":>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""消息吞吐量基准测试：对比同步写入与异步批量写入（MESSAGE_WRITE_BEHIND）
+
+用法（在项目根目录下）:
+    python benchmarks/bench_message_throughput.py [--senders 20] [--messages 200] [--synchronous FULL]
+
+计时从开始发送到所有消息都写入数据库为止。synchronous=NORMAL 时单条提交的开销已经不大，
+两种方式的差距随机器而异，可能在测量误差范围内，请多运行几次再下结论。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# 固定使用 threading 模式：装有 eventlet 时 Flask-SocketIO 会自动选用它，但这里没有打猴子补丁，后台任务不会运行
+os.environ['CLASSROOM_ASYNC_MODE'] = 'threading'
+
+from app import app, get_db_connection, init_db, reset_db_pool, stop_message_writer
+
+
+def run(write_behind, sender_count, message_count):
+    """返回 (每秒消息数, 数据库中的消息条数)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        app.config['MESSAGE_WRITE_BEHIND'] = write_behind
+        app.config['RATE_LIMIT_ENABLED'] = False   # 测量写入本身的吞吐，不受单用户发送频率限制
+        reset_db_pool()
+        init_db()
+
+        conn = get_db_connection()
+        teacher_id = conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')").lastrowid
+        chatroom_id = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)',
+                                   ('压测聊天室', teacher_id)).lastrowid
+        sender_ids = [conn.execute("INSERT INTO users (name, role) VALUES (?, 'student')",
+                                   (f'学生{i}',)).lastrowid
+                      for i in range(sender_count)]
+        conn.commit()
+        conn.close()
+
+        def sender(user_id):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+                sess['user_name'] = f'学生{user_id}'
+                sess['user_role'] = 'student'
+            for i in range(message_count):
+                client.post('/api/message/public', json={'content': f'消息{i}', 'chatroom_id': chatroom_id})
+
+        threads = [threading.Thread(target=sender, args=(uid,)) for uid in sender_ids]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 计时包含把队列中剩余的消息写完，异步模式下只算放入队列的时间没有意义
+        stop_message_writer()
+        elapsed = time.perf_counter() - start
+
+        # 确认所有消息最终都写入了数据库
+        conn = get_db_connection()
+        stored = conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+        conn.close()
+        reset_db_pool()
+
+    return sender_count * message_count / elapsed, stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比同步写入与异步批量写入的消息吞吐量')
+    parser.add_argument('--senders', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=200, help='每个发送者发送的消息数')
+    parser.add_argument('--synchronous', default=app.config['DB_SYNCHRONOUS'])
+    args = parser.parse_args()
+
+    app.config['DB_SYNCHRONOUS'] = args.synchronous
+    print(f'发送者: {args.senders}  每人消息数: {args.messages}  synchronous={args.synchronous}')
+    for write_behind in (False, True):
+        rate, stored = run(write_behind, args.senders, args.messages)
+        mode = '异步批量写入' if write_behind else '同步写入'
+        print(f'{mode:<10} {rate:>10.0f} 条/秒   已落库 {stored} 条')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""答题高峰压力测试：模拟多名学生在几秒内同时提交答案
+
+用法（在项目根目录下）:
+    python benchmarks/bench_quiz_burst.py [--students 40] [--questions 5]
+    python benchmarks/bench_quiz_burst.py --journal-mode DELETE --pool-size 0   # 对比旧配置
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from app import app, get_db_connection, init_db, reset_db_pool
+
+
+def setup_classroom(student_count, question_count):
+    """创建教师、聊天室、学生和题目，返回 (学生ID列表, 题目ID列表)"""
+    conn = get_db_connection()
+    teacher_id = conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')").lastrowid
+    chatroom_id = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)',
+                               ('压测聊天室', teacher_id)).lastrowid
+    student_ids = [conn.execute("INSERT INTO users (name, role) VALUES (?, 'student')",
+                                (f'学生{i}',)).lastrowid
+                   for i in range(student_count)]
+    question_ids = [conn.execute('''
+        INSERT INTO questions (chatroom_id, creator_id, title, content, type, options, answer)
+        VALUES (?, ?, ?, '1+1=?', 'choice', '["1", "2"]', '1')
+    ''', (chatroom_id, teacher_id, f'题目{i}')).lastrowid for i in range(question_count)]
+    conn.commit()
+    conn.close()
+    return student_ids, question_ids
+
+
+def student(student_id, question_ids, barrier, latencies, errors):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = student_id
+        sess['user_name'] = f'学生{student_id}'
+        sess['user_role'] = 'student'
+
+    for question_id in question_ids:
+        # 所有学生在同一时刻开始提交同一道题
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            response = client.post('/api/question/answer',
+                                   json={'question_id': question_id, 'content': '1'})
+            if response.status_code != 200:
+                errors.append(f'{response.status_code} {response.get_json()}')
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟答题高峰，统计提交延迟和失败次数')
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--journal-mode', default=app.config['DB_JOURNAL_MODE'])
+    parser.add_argument('--synchronous', default=app.config['DB_SYNCHRONOUS'])
+    parser.add_argument('--pool-size', type=int, default=app.config['DB_POOL_SIZE'])
+    parser.add_argument('--busy-timeout-ms', type=int, default=app.config['DB_BUSY_TIMEOUT_MS'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        app.config['DB_JOURNAL_MODE'] = args.journal_mode
+        app.config['DB_SYNCHRONOUS'] = args.synchronous
+        app.config['DB_POOL_SIZE'] = args.pool_size
+        app.config['DB_BUSY_TIMEOUT_MS'] = args.busy_timeout_ms
+        reset_db_pool()
+        init_db()
+
+        student_ids, question_ids = setup_classroom(args.students, args.questions)
+
+        barrier = threading.Barrier(args.students)
+        latencies, errors = [], []
+        threads = [threading.Thread(target=student, args=(sid, question_ids, barrier, latencies, errors))
+                   for sid in student_ids]
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        reset_db_pool()
+
+    latencies.sort()
+    print(f'配置: journal_mode={args.journal_mode} synchronous={args.synchronous} '
+          f'pool_size={args.pool_size} busy_timeout={args.busy_timeout_ms}ms')
+    print(f'提交次数: {len(latencies)}  失败: {len(errors)}  总耗时: {elapsed:.2f}s')
+    print(f'延迟(ms): p50={statistics.median(latencies):.1f} '
+          f'p95={latencies[int(len(latencies) * 0.95) - 1]:.1f} max={latencies[-1]:.1f}')
+    for error in errors[:5]:
+        print('  ', error)
+
+
+if __name__ == '__main__':
+    main()
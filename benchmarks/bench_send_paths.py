@@ -0,0 +1,137 @@
+"""消息发送路径基准测试：对比 HTTP POST 与 WebSocket 事件发送消息的延迟
+
+在本进程内启动服务器，模拟多个同时在线的学生客户端。
+需要安装: pip install "python-socketio[client]" requests
+
+用法（在项目根目录下）:
+    python benchmarks/bench_send_paths.py [--clients 60] [--messages 20]
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio as socketio_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from app import app, socketio, get_db_connection, init_db, reset_db_pool
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Student:
+    """一个已登录并加入聊天室的学生客户端"""
+
+    def __init__(self, base_url, user_id, chatroom_id):
+        self.chatroom_id = chatroom_id
+        self.http = requests.Session()
+        self.http.post(f'{base_url}/student/select_name',
+                       data={'user_id': user_id, 'chatroom_id': chatroom_id},
+                       allow_redirects=False)
+        cookie = '; '.join(f'{k}={v}' for k, v in self.http.cookies.items())
+        self.sio = socketio_client.Client()
+        self.sio.connect(base_url, headers={'Cookie': cookie}, transports=['websocket'])
+        self.sio.emit('join', {'chatroom_id': chatroom_id})
+        self.base_url = base_url
+
+    def send_http(self, content):
+        start = time.perf_counter()
+        response = self.http.post(f'{self.base_url}/api/message/public',
+                                  json={'content': content, 'chatroom_id': self.chatroom_id})
+        assert response.json()['success']
+        return (time.perf_counter() - start) * 1000
+
+    def send_socket(self, content):
+        start = time.perf_counter()
+        response = self.sio.call('send_message', {'content': content, 'chatroom_id': self.chatroom_id})
+        assert response['success']
+        return (time.perf_counter() - start) * 1000
+
+    def close(self):
+        self.sio.disconnect()
+
+
+def run_path(students, send_name, message_count):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(students))
+
+    def worker(student):
+        send = getattr(student, send_name)
+        barrier.wait()
+        local = [send(f'消息{i}') for i in range(message_count)]
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in students]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 HTTP 与 WebSocket 发送消息的延迟')
+    parser.add_argument('--clients', type=int, default=60)
+    parser.add_argument('--messages', type=int, default=20, help='每个客户端发送的消息数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        app.config['RATE_LIMIT_ENABLED'] = False   # 每个客户端连续发送，关闭限流以测量发送路径本身的延迟
+        reset_db_pool()
+        init_db()
+
+        conn = get_db_connection()
+        teacher_id = conn.execute("INSERT INTO users (name, role) VALUES ('教师', 'teacher')").lastrowid
+        chatroom_id = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)',
+                                   ('压测聊天室', teacher_id)).lastrowid
+        student_ids = [conn.execute("INSERT INTO users (name, role) VALUES (?, 'student')",
+                                    (f'学生{i}',)).lastrowid
+                       for i in range(args.clients)]
+        conn.commit()
+        conn.close()
+
+        port = free_port()
+        threading.Thread(target=socketio.run, args=(app,),
+                         kwargs={'host': '127.0.0.1', 'port': port, 'allow_unsafe_werkzeug': True},
+                         daemon=True).start()
+        time.sleep(1)
+        base_url = f'http://127.0.0.1:{port}'
+
+        students = [Student(base_url, sid, chatroom_id) for sid in student_ids]
+
+        print(f'客户端: {args.clients}  每客户端消息数: {args.messages}')
+        print(f'{"路径":<10}{"p50(ms)":>10}{"p95(ms)":>10}{"p99(ms)":>10}{"条/秒":>10}')
+        for label, send_name in (('HTTP', 'send_http'), ('WebSocket', 'send_socket')):
+            latencies, elapsed = run_path(students, send_name, args.messages)
+            print(f'{label:<10}{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}'
+                  f'{percentile(latencies, 99):>10.1f}{len(latencies) / elapsed:>10.0f}')
+
+        # 并行断开，避免逐个等待关闭握手
+        closers = [threading.Thread(target=student.close) for student in students]
+        for t in closers:
+            t.start()
+        for t in closers:
+            t.join()
+        reset_db_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""启动耗时测试：用 python -X importtime 统计导入 app 模块的耗时并列出最慢的模块，同时测量 init_db 的耗时
+
+用法（在项目根目录下）:
+    python benchmarks/bench_startup.py [--runs 5] [--top 15] [--budget-ms 1000]
+
+每次在新的子进程中导入（不受已缓存模块影响）。出现以下情况时以退出码 1 结束，便于发现启动变慢：
+- 导入时加载了应按需导入的模块（pandas、openpyxl）
+- 导入本身访问了数据库（创建了数据库文件）
+- 导入耗时的中位数超过 --budget-ms
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# 只在用到时才导入的重量级依赖，启动阶段不应出现
+LAZY_MODULES = ('pandas', 'openpyxl')
+
+PROBE = '''
+import os, time
+import app
+db_created = os.path.exists(app.app.config['DATABASE'])
+started = time.perf_counter()
+app.init_db()
+print(f'INIT_DB_MS {(time.perf_counter() - started) * 1000:.1f} {int(db_created)}')
+'''
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出，返回 {模块名: (自身耗时us, 累计耗时us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(async_mode):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, CLASSROOM_ASYNC_MODE=async_mode,
+                   CLASSROOM_DATABASE=os.path.join(tmp, 'startup.db'))
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE],
+                                cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f'导入失败:\n{result.stderr[-2000:]}')
+
+    init_line = next(line for line in result.stdout.splitlines() if line.startswith('INIT_DB_MS'))
+    _, init_ms, db_created = init_line.split()
+    return parse_importtime(result.stderr), float(init_ms), db_created == '1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='统计导入 app 模块和初始化数据库的耗时')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='列出累计耗时最长的模块数')
+    parser.add_argument('--budget-ms', type=float, default=1000, help='导入耗时中位数的上限')
+    parser.add_argument('--async-mode', default='threading')
+    args = parser.parse_args()
+
+    import_ms, init_ms = [], []
+    lazy_loaded, db_touched = set(), False
+    for _ in range(args.runs):
+        modules, init, db_created = run_once(args.async_mode)
+        import_ms.append(modules['app'][1] / 1000)
+        init_ms.append(init)
+        lazy_loaded.update(name.split('.')[0] for name in modules if name.split('.')[0] in LAZY_MODULES)
+        db_touched = db_touched or db_created
+
+    median_import = statistics.median(import_ms)
+    print(f'导入 app: 中位数 {median_import:.0f}ms  最快 {min(import_ms):.0f}ms  最慢 {max(import_ms):.0f}ms'
+          f'  （{args.runs} 次，{args.async_mode} 模式）')
+    print(f'init_db（新建数据库）: 中位数 {statistics.median(init_ms):.1f}ms')
+
+    print(f'\n累计耗时最长的 {args.top} 个模块（最后一次）:')
+    print(f'{"累计ms":>8} {"自身ms":>8}  模块')
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f'{cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}')
+
+    failures = []
+    if lazy_loaded:
+        failures.append(f'导入时加载了应按需导入的模块: {", ".join(sorted(lazy_loaded))}')
+    if db_touched:
+        failures.append('导入 app 时创建了数据库文件，建表应在 init_db() 中进行')
+    if median_import > args.budget_ms:
+        failures.append(f'导入耗时中位数 {median_import:.0f}ms 超过上限 {args.budget_ms:.0f}ms')
+
+    print()
+    for failure in failures:
+        print('失败:', failure)
+    if not failures:
+        print('通过')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+"""课堂全流程负载测试：模拟一名教师和 N 名学生上完一节课，作为评估各项性能改动的基准
+
+流程（全部通过HTTP和WebSocket完成，与浏览器的操作一致）:
+    1. 教师注册、上传学生名单、创建聊天室
+    2. 学生选择姓名、打开聊天室页面、建立WebSocket连接并加入聊天室
+    3. 学生聊天（大部分通过WebSocket发送，部分通过HTTP接口发送）
+    4. 教师连续发布多道题目，学生收到题目后立即作答
+    5. 教师发起签到，学生收到后立即签到
+    6. 学生断线重连并补齐断线期间的数据
+    7. 教师查看答题统计和出勤统计
+最后输出每个接口的 p50/p95/p99 延迟，以及消息、题目、签到从发出到送达每个学生的端到端延迟。
+
+默认使用 app_launcher.py 在本机启动一个使用临时数据库的服务器；也可以用 --url 指定已运行的服务器
+（会在该服务器上注册教师、导入学生并创建聊天室，不要对正式上课使用的服务器运行）。
+需要安装: pip install "python-socketio[client]" requests
+
+用法（在项目根目录下）:
+    python benchmarks/load_classroom.py [--students 60] [--async-mode eventlet]
+    python benchmarks/load_classroom.py --url http://127.0.0.1:5000 --students 40
+"""
+import argparse
+import collections
+import os
+import queue
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio as socketio_client
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(base_url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError('服务器未能启动')
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float('nan')
+
+
+class Recorder:
+    """线程安全地记录每类操作的延迟、失败和被限流次数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.limited = collections.Counter()
+        self.samples = collections.defaultdict(list)
+
+    def add(self, name, ms):
+        with self.lock:
+            self.latencies[name].append(ms)
+
+    def fail(self, name, message):
+        with self.lock:
+            self.errors[name] += 1
+            if len(self.samples[name]) < 3:
+                self.samples[name].append(message)
+
+    def http(self, name, send, expect=(200,)):
+        """执行一次HTTP请求并按状态码记录结果，返回响应（请求异常时返回 None）"""
+        start = time.perf_counter()
+        try:
+            response = send()
+        except requests.RequestException as e:
+            self.fail(name, repr(e))
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code == 429:
+            with self.lock:
+                self.limited[name] += 1
+        elif response.status_code in expect:
+            self.add(name, elapsed)
+        else:
+            self.fail(name, f'{response.status_code} {response.text[:100]}')
+        return response
+
+    def ack(self, name, call):
+        """执行一次带确认回执的WebSocket事件，返回回执（失败时返回 None）"""
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            self.fail(name, repr(e))
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        if isinstance(result, dict) and result.get('retry_after') is not None:
+            with self.lock:
+                self.limited[name] += 1
+        elif isinstance(result, dict) and result.get('success') is False:
+            self.fail(name, result.get('error'))
+        else:
+            self.add(name, elapsed)
+        return result
+
+    def report(self):
+        print(f'\n{"操作":<36}{"次数":>6}{"失败":>6}{"限流":>6}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}  (ms)')
+        for name in sorted(set(self.latencies) | set(self.errors) | set(self.limited)):
+            values = self.latencies[name]
+            print(f'{name:<36}{len(values):>6}{self.errors[name]:>6}{self.limited[name]:>6}'
+                  f'{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}'
+                  f'{percentile(values, 99):>9.1f}{max(values) if values else float("nan"):>9.1f}')
+        for name, messages in self.samples.items():
+            for message in messages:
+                print(f'  {name}: {message}')
+
+
+class Broadcasts:
+    """记录广播的发出时间，并在各客户端收到时计算端到端延迟"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.lock = threading.Lock()
+        self.sent = {}
+        self.delivered = collections.Counter()
+        self.expected = collections.Counter()
+
+    def mark_sent(self, kind, tag, recipients):
+        with self.lock:
+            self.sent[tag] = time.perf_counter()
+            self.expected[kind] += recipients
+
+    def received(self, kind, tag):
+        now = time.perf_counter()
+        with self.lock:
+            sent_at = self.sent.get(tag)
+            if sent_at is None:
+                return
+            self.delivered[kind] += 1
+        self.recorder.add(f'广播送达 {kind}', (now - sent_at) * 1000)
+
+    def report(self):
+        print()
+        for kind in sorted(self.expected):
+            print(f'广播 {kind}: 送达 {self.delivered[kind]} / 应送达 {self.expected[kind]}')
+
+
+def socket_cookie(http):
+    return '; '.join(f'{k}={v}' for k, v in http.cookies.items())
+
+
+class Teacher:
+    def __init__(self, base_url, recorder, broadcasts):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.broadcasts = broadcasts
+        self.http = requests.Session()
+        self.sio = None
+        self.chatroom_id = None
+        self.answer_stats_pushes = 0
+
+    def setup(self, run_id, student_names):
+        r = self.recorder
+        r.http('POST /teacher/register', lambda: self.http.post(
+            f'{self.base_url}/teacher/register',
+            data={'username': f'压测教师{run_id}', 'password': run_id}, allow_redirects=False), expect=(302,))
+
+        roster = '姓名\n' + '\n'.join(student_names) + '\n'
+        r.http('POST /teacher/import_students', lambda: self.http.post(
+            f'{self.base_url}/teacher/import_students',
+            files={'file': ('roster.csv', roster.encode('utf-8'), 'text/csv')}))
+
+        r.http('POST /teacher/create_chatroom', lambda: self.http.post(
+            f'{self.base_url}/teacher/create_chatroom',
+            data={'name': f'压测聊天室{run_id}'}, allow_redirects=False), expect=(302,))
+
+        dashboard = r.http('GET /teacher/dashboard', lambda: self.http.get(f'{self.base_url}/teacher/dashboard'))
+        self.chatroom_id = max(int(i) for i in re.findall(r'/chatroom/(\d+)', dashboard.text))
+
+        self.sio = socketio_client.Client(reconnection=False)
+
+        @self.sio.on('answer_stats')
+        def on_answer_stats(data):
+            self.answer_stats_pushes += 1
+
+        self.sio.connect(self.base_url, headers={'Cookie': socket_cookie(self.http)}, transports=['websocket'])
+        self.sio.call('join', {'chatroom_id': self.chatroom_id}, timeout=30)
+
+    def publish_questions(self, count, recipients):
+        question_ids = []
+        for i in range(count):
+            tag = f'题目{i}'
+            self.broadcasts.mark_sent('new_question', tag, recipients)
+            response = self.recorder.http('POST /api/question/create', lambda: self.http.post(
+                f'{self.base_url}/api/question/create',
+                json={'title': tag, 'content': '1+1=?', 'type': 'choice', 'options': ['1', '2', '3'],
+                      'answer': '1', 'chatroom_id': self.chatroom_id}))
+            if response is not None and response.status_code == 200:
+                question_ids.append(response.json()['question_id'])
+        return question_ids
+
+    def publish_attendance(self, recipients):
+        tag = '课堂签到'
+        self.broadcasts.mark_sent('new_attendance', tag, recipients)
+        self.recorder.http('POST /api/attendance/create', lambda: self.http.post(
+            f'{self.base_url}/api/attendance/create',
+            json={'title': tag, 'type': 'click', 'chatroom_id': self.chatroom_id, 'expire_minutes': 10}))
+
+    def review(self, question_ids):
+        for question_id in question_ids:
+            self.recorder.http('GET /api/question/<id>/stats', lambda: self.http.get(
+                f'{self.base_url}/api/question/{question_id}/stats'))
+        self.recorder.http('GET /api/attendance/report', lambda: self.http.get(
+            f'{self.base_url}/api/attendance/report/{self.chatroom_id}'))
+        self.recorder.http('GET /chatroom/<id> (教师)', lambda: self.http.get(
+            f'{self.base_url}/chatroom/{self.chatroom_id}'))
+
+    def close(self):
+        if self.sio is not None:
+            self.sio.disconnect()
+
+
+class Student:
+    def __init__(self, base_url, chatroom_id, user_id, recorder, broadcasts):
+        self.base_url = base_url
+        self.chatroom_id = chatroom_id
+        self.user_id = user_id
+        self.recorder = recorder
+        self.broadcasts = broadcasts
+        self.http = requests.Session()
+        self.sio = None
+        self.inbox = queue.Queue()
+        self.last_seen = {'message_id': 0, 'question_id': 0, 'attendance_id': 0}
+
+    def _on_event(self, event, data):
+        if event == 'new_message':
+            self.last_seen['message_id'] = max(self.last_seen['message_id'], data['id'])
+            self.broadcasts.received('new_message', data['content'])
+        elif event == 'new_question':
+            self.last_seen['question_id'] = max(self.last_seen['question_id'], data['id'])
+            self.broadcasts.received('new_question', data['title'])
+            self.inbox.put(('question', data))
+        elif event == 'new_attendance':
+            self.last_seen['attendance_id'] = max(self.last_seen['attendance_id'], data['id'])
+            self.broadcasts.received('new_attendance', data['title'])
+            self.inbox.put(('attendance', data))
+
+    def _connect_socket(self):
+        sio = socketio_client.Client(reconnection=False)
+        for event in ('new_message', 'new_question', 'new_attendance'):
+            sio.on(event, lambda data, event=event: self._on_event(event, data))
+        # 服务器开启广播合并时多个事件打包在一个 batch 帧中
+        sio.on('batch', lambda events: [self._on_event(item['event'], item['data']) for item in events])
+        sio.connect(self.base_url, headers={'Cookie': socket_cookie(self.http)}, transports=['websocket'])
+        return sio
+
+    def join(self):
+        r = self.recorder
+        r.http('POST /student/select_name', lambda: self.http.post(
+            f'{self.base_url}/student/select_name',
+            data={'user_id': self.user_id, 'chatroom_id': self.chatroom_id}, allow_redirects=False),
+            expect=(302,))
+        r.http('GET /chatroom/<id>', lambda: self.http.get(f'{self.base_url}/chatroom/{self.chatroom_id}'))
+
+        start = time.perf_counter()
+        self.sio = self._connect_socket()
+        r.add('WS connect', (time.perf_counter() - start) * 1000)
+        r.ack('WS join', lambda: self.sio.call('join', {'chatroom_id': self.chatroom_id}, timeout=30))
+
+    def chat(self, count, interval, recipients):
+        for i in range(count):
+            time.sleep(random.uniform(0, interval * 2))
+            tag = f'{self.user_id}-{i}'
+            self.broadcasts.mark_sent('new_message', tag, recipients)
+            payload = {'content': tag, 'chatroom_id': self.chatroom_id}
+            # 每5条中有1条走HTTP接口（模拟WebSocket断开时的回退路径）
+            if i % 5 == 4:
+                self.recorder.http('POST /api/message/public', lambda: self.http.post(
+                    f'{self.base_url}/api/message/public', json=payload))
+            else:
+                self.recorder.ack('WS send_message', lambda: self.sio.call('send_message', payload, timeout=30))
+
+    def handle(self, kind, count, timeout):
+        """依次处理收到的 count 个题目或签到"""
+        deadline = time.time() + timeout
+        handled = 0
+        while handled < count:
+            try:
+                item_kind, data = self.inbox.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                self.recorder.fail(f'等待{kind}', f'{timeout}s 内只收到 {handled}/{count} 个')
+                return
+            if item_kind != kind:
+                continue
+            handled += 1
+            if kind == 'question':
+                self.recorder.http('POST /api/question/answer', lambda: self.http.post(
+                    f'{self.base_url}/api/question/answer',
+                    json={'question_id': data['id'], 'content': str(random.randrange(3))}))
+            else:
+                self.recorder.http('POST /api/attendance/sign', lambda: self.http.post(
+                    f'{self.base_url}/api/attendance/sign', json={'attendance_id': data['id']}))
+
+    def reconnect(self):
+        self.sio.disconnect()
+        start = time.perf_counter()
+        try:
+            self.sio = self._connect_socket()
+            delta = self.sio.call('join', {'chatroom_id': self.chatroom_id, 'last_seen': self.last_seen},
+                                  timeout=30)
+        except Exception as e:
+            self.recorder.fail('WS 断线重连+增量同步', repr(e))
+            return
+        if isinstance(delta, dict) and delta.get('success'):
+            self.recorder.add('WS 断线重连+增量同步', (time.perf_counter() - start) * 1000)
+        else:
+            self.recorder.fail('WS 断线重连+增量同步', repr(delta))
+
+    def close(self):
+        if self.sio is not None:
+            self.sio.disconnect()
+
+
+def student_ids(base_url, chatroom_id, names):
+    """从学生选择姓名页面中找出本次导入的学生ID"""
+    page = requests.get(f'{base_url}/student/chatroom/{chatroom_id}').text
+    found = dict(re.findall(r'name="user_id" value="(\d+)".*?>\s*([^<]+?)\s*</button>', page, re.S))
+    by_name = {name: int(user_id) for user_id, name in found.items()}
+    return [by_name[name] for name in names if name in by_name]
+
+
+def run_parallel(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟一节完整的课堂，统计各接口延迟和广播送达延迟')
+    parser.add_argument('--url', help='对已运行的服务器测试；不指定时在本机启动临时服务器')
+    parser.add_argument('--async-mode', default='auto', choices=['auto', 'eventlet', 'gevent', 'threading'])
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--messages', type=int, default=5, help='每名学生发送的消息数')
+    parser.add_argument('--chat-interval', type=float, default=3.0, help='学生发送消息的平均间隔（秒）')
+    parser.add_argument('--questions', type=int, default=5, help='教师连续发布的题目数')
+    parser.add_argument('--timeout', type=float, default=60.0, help='等待题目和签到送达的最长时间（秒）')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, CLASSROOM_DATABASE=os.path.join(tmp.name, 'load.db'), CLASSROOM_LOG_DIR=tmp.name)
+        server = subprocess.Popen(
+            [sys.executable, 'app_launcher.py', '--no-browser', '--host', '127.0.0.1', '--port', str(port),
+             '--async-mode', args.async_mode],
+            cwd=SRC_DIR, env=env, stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    recorder = Recorder()
+    broadcasts = Broadcasts(recorder)
+    teacher = Teacher(base_url, recorder, broadcasts)
+    students = []
+    try:
+        wait_for_server(base_url)
+
+        run_id = time.strftime('%H%M%S')
+        names = [f'压测学生{run_id}_{i}' for i in range(args.students)]
+        teacher.setup(run_id, names)
+        students = [Student(base_url, teacher.chatroom_id, user_id, recorder, broadcasts)
+                    for user_id in student_ids(base_url, teacher.chatroom_id, names)]
+        print(f'服务器: {base_url}  聊天室: {teacher.chatroom_id}  学生: {len(students)}')
+
+        elapsed = run_parallel([s.join for s in students])
+        print(f'学生进入聊天室: {elapsed:.1f}s')
+
+        # 发送者本人和教师也会收到公共消息广播，但只统计学生端的送达
+        elapsed = run_parallel([lambda s=s: s.chat(args.messages, args.chat_interval, len(students))
+                                for s in students])
+        print(f'聊天: {elapsed:.1f}s')
+        time.sleep(1)
+
+        answering = [threading.Thread(target=s.handle, args=('question', args.questions, args.timeout))
+                     for s in students]
+        for t in answering:
+            t.start()
+        start = time.perf_counter()
+        question_ids = teacher.publish_questions(args.questions, len(students))
+        for t in answering:
+            t.join()
+        print(f'答题: {time.perf_counter() - start:.1f}s')
+
+        signing = [threading.Thread(target=s.handle, args=('attendance', 1, args.timeout)) for s in students]
+        for t in signing:
+            t.start()
+        start = time.perf_counter()
+        teacher.publish_attendance(len(students))
+        for t in signing:
+            t.join()
+        print(f'签到: {time.perf_counter() - start:.1f}s')
+
+        elapsed = run_parallel([s.reconnect for s in students])
+        print(f'断线重连: {elapsed:.1f}s')
+
+        # 等待合并推送的答题统计到达后再查看统计
+        time.sleep(1)
+        teacher.review(question_ids)
+
+        recorder.report()
+        broadcasts.report()
+        print(f'教师收到答题统计推送: {teacher.answer_stats_pushes} 次（作答 {len(students) * args.questions} 次）')
+    finally:
+        run_parallel([s.close for s in students] + [teacher.close])
+        if server is not None:
+            server.terminate()
+            server.wait()
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,317 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask, Response, g, render_template, request, jsonify, session, redirect, url_for, send_file
+from flask_socketio import SocketIO, join_room, leave_room
+from socketio import packet as socketio_packet
 import sqlite3
 import os
+import threading
+import queue
+import atexit
+import bisect
+import collections
+import heapq
+import csv
+import gzip
+import io
+import itertools
 import json
-import pandas as pd
-from datetime import datetime
+import math
+import time
+from datetime import datetime, timedelta, timezone
 import secrets
+import tempfile
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
+from fanout import socketio_queue_options
+from metrics import Registry
+from assets import StaticAssets
 
 # 初始化Flask应用
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(16)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# 模板中解析数据库里以JSON字符串保存的字段（如题目选项）
+app.jinja_env.filters['fromjson'] = json.loads
+# 静态资源（含第三方前端库）从本机提供，不依赖外网：模板中用 asset_url() 引用带内容哈希的地址
+assets = StaticAssets(os.path.join(app.root_path, 'static'))
+app.jinja_env.globals['asset_url'] = lambda filename: url_for('static_asset', filename=assets.url_path(filename))
+# 运行指标：HTTP请求、数据库语句和WebSocket发送的耗时与次数，由 /metrics 接口输出
+metrics = Registry()
+http_request_seconds = metrics.histogram('classroom_http_request_duration_seconds',
+                                         'HTTP请求处理耗时（含模板渲染）', ('method', 'route', 'status'))
+db_query_seconds = metrics.histogram('classroom_db_query_duration_seconds',
+                                     '数据库语句执行耗时（含等待写锁）', ('operation',))
+socketio_emits = metrics.counter('classroom_socketio_emit_total', '服务器发出的WebSocket事件数', ('event',))
+socketio_emit_bytes = metrics.counter('classroom_socketio_emit_bytes_total',
+                                      '服务器发出的WebSocket事件编码后的字节数（每次发送计一份）', ('event',))
+socketio_emit_frames = metrics.counter('classroom_socketio_emit_frames_total',
+                                       '按本进程接收者人数估算的下发帧数', ('event',))
 
-# 确保数据库目录存在
+# 记录每次发送的事件名和接收人数
+class InstrumentedSocketIO(SocketIO):
+    def emit(self, event, *args, **kwargs):
+        to = kwargs.get('to') or kwargs.get('room')
+        rooms = self.server.manager.rooms.get(kwargs.get('namespace', '/'), {})
+        recipients = len(rooms.get(to, ())) if to else len(rooms.get(None, ()))
+        skip_sid = kwargs.get('skip_sid')
+        recipients -= len(skip_sid) if isinstance(skip_sid, list) else 1 if skip_sid else 0
+        
+        socketio_emits.inc(event=event)
+        socketio_emit_frames.inc(recipients, event=event)
+        return super().emit(event, *args, **kwargs)
+
+# 记录事件编码后的大小：Socket.IO 对一次广播只编码一次，在编码处取长度，不必为统计再序列化一遍
+class MeasuredPacket(socketio_packet.Packet):
+    def encode(self):
+        encoded = super().encode()
+        if self.packet_type == socketio_packet.EVENT and self.data:
+            parts = encoded if isinstance(encoded, list) else [encoded]
+            size = sum(len(part.encode('utf-8')) if isinstance(part, str) else len(part) for part in parts)
+            socketio_emit_bytes.inc(size, event=self.data[0])
+        return encoded
+
+# 异步模式由启动器通过环境变量指定（eventlet / gevent / threading），未指定时由Flask-SocketIO自动选择。
+# 多进程部署时通过 CLASSROOM_MESSAGE_QUEUE 指定进程间的广播通道（见 fanout.py）。
+socketio = InstrumentedSocketIO(app, cors_allowed_origins="*", serializer=MeasuredPacket,
+                    async_mode=os.environ.get('CLASSROOM_ASYNC_MODE') or None,
+                    **socketio_queue_options(os.environ.get('CLASSROOM_MESSAGE_QUEUE')))
+
+# 允许同时在线的WebSocket连接数上限，0 表示不限制（可由启动器参数覆盖）
+app.config['MAX_SOCKET_CONNECTIONS'] = 0
+
+# 聊天记录分页：首屏加载的消息条数，以及单次向上翻页的最大条数
+app.config['MESSAGE_PAGE_SIZE'] = 50
+app.config['MESSAGE_PAGE_MAX'] = 200
+# 聊天记录搜索：每页结果数、关键词最大长度
+app.config['MESSAGE_SEARCH_PAGE_SIZE'] = 20
+app.config['MESSAGE_SEARCH_MAX_QUERY'] = 100
+
+# 默认数据库位置（目录在 init_db 时创建）
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data')
-os.makedirs(DB_PATH, exist_ok=True)
 DB_FILE = os.path.join(DB_PATH, 'classroom.db')
 
-# 初始化数据库
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
+# 数据库连接配置
+app.config['DATABASE'] = os.environ.get('CLASSROOM_DATABASE') or DB_FILE
+app.config['DB_POOL_SIZE'] = 16               # 连接池最多保留的空闲连接数
+app.config['DB_JOURNAL_MODE'] = 'WAL'         # WAL模式下读写互不阻塞
+app.config['DB_SYNCHRONOUS'] = 'NORMAL'       # WAL模式下NORMAL即可保证不损坏数据库
+app.config['DB_BUSY_TIMEOUT_MS'] = 5000       # 遇到写锁时的等待时间
+app.config['DB_STATEMENT_CACHE_SIZE'] = 128   # 每个连接缓存的预编译语句数
+
+# 消息异步落库：开启后消息先分配ID并立即广播，由后台线程批量写入数据库。
+# 进程异常退出时最多丢失 MESSAGE_FLUSH_INTERVAL_MS 内的消息；仅适用于单进程部署。
+app.config['MESSAGE_WRITE_BEHIND'] = False
+app.config['MESSAGE_FLUSH_INTERVAL_MS'] = 20
+app.config['MESSAGE_FLUSH_MAX_BATCH'] = 500
+
+# 答题统计推送给教师的最短间隔，期间的多次提交合并为一次推送
+app.config['ANSWER_STATS_PUSH_INTERVAL_MS'] = 500
+# 内存中最多保留统计的题目数，超出时淘汰最久未访问的题目，再次访问时从答题记录重建
+app.config['ANSWER_STATS_MAX_QUESTIONS'] = 256
+
+# 聊天室页面快照：成员、题目和签到列表在内存中缓存，最多保留 ROOM_SNAPSHOT_MAX_ROOMS 个聊天室。
+# 本进程内的修改会立即清除对应快照；多进程部署时其他进程的修改最迟 ROOM_SNAPSHOT_TTL_S 秒后生效
+app.config['ROOM_SNAPSHOT_MAX_ROOMS'] = 64
+app.config['ROOM_SNAPSHOT_TTL_S'] = 30
+
+# 在线状态广播的合并间隔：期间的进出变化合并为一次 presence 推送，上课时全班同时进入只推送一次
+app.config['PRESENCE_BROADCAST_INTERVAL_MS'] = 1000
+# 多进程部署时各进程更新在线状态心跳的间隔；超过3个间隔没有心跳的进程，其连接视为已断开
+app.config['PRESENCE_HEARTBEAT_S'] = 10
+
+# 带哈希的静态资源地址的缓存时间；页面和JSON响应超过 COMPRESS_MIN_SIZE 字节时按 gzip 压缩
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600
+app.config['COMPRESS_MIMETYPES'] = ('text/html', 'application/json')
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_LEVEL'] = 6
+
+# 聊天室广播（公共消息、签到记录、进出提示）的合并窗口，0 表示不合并、逐条立即发送
+app.config['BROADCAST_BATCH_WINDOW_MS'] = 0
+
+# 运行指标：/metrics 只允许这些地址或已登录的教师访问；处理时间超过 SLOW_REQUEST_MS 的请求记录到日志
+app.config['METRICS_ALLOWED_ADDRS'] = ('127.0.0.1', '::1')
+# 位于反向代理之后时的代理层数（由启动器 --trusted-proxies 设置，见 trust_proxies）。
+# 为0时经代理转发的请求来源地址是代理本身，不能据此判断访问者
+app.config['TRUSTED_PROXIES'] = 0
+app.config['SLOW_REQUEST_MS'] = 1000
+
+# 写操作限流：每项为 (每秒补充的次数, 允许的瞬时突发次数)，分别按用户和聊天室计算，None 表示不限制
+app.config['RATE_LIMIT_ENABLED'] = True
+app.config['RATE_LIMITS'] = {
+    'message': {'user': (1, 10), 'room': (20, 100)},          # 公共消息
+    'private_message': {'user': (1, 10), 'room': None},       # 私人消息
+    'answer': {'user': (1, 5), 'room': (50, 200)},            # 提交答案，全班同时作答也不受影响
+    'attendance_sign': {'user': (1, 5), 'room': (50, 200)},   # 学生签到
+    'publish': {'user': (0.5, 10), 'room': None},             # 教师发布题目、签到，创建聊天室、导入学生名单
+    'read_marker': {'user': (2, 20), 'room': None},           # 标记私聊已读，切换会话时连续触发
+    'presence': {'user': (0.2, 3), 'room': None},             # 进出聊天室（超出时仍加入房间，但不登记到共享的在线状态、不推送）
+}
+
+# 数据库结构迁移：按顺序执行，已执行到的版本号记录在 PRAGMA user_version 中。
+# 新增迁移只能追加到列表末尾，不能修改已发布的条目。
+MIGRATIONS = [
+    # 版本1：为高频查询添加复合索引
+    '''
+    CREATE INDEX IF NOT EXISTS idx_messages_room_type ON messages (chatroom_id, type, id);
+    CREATE INDEX IF NOT EXISTS idx_chatroom_members_room ON chatroom_members (chatroom_id, user_id);
+    CREATE INDEX IF NOT EXISTS idx_questions_room ON questions (chatroom_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_answers_question_user ON answers (question_id, user_id);
+    CREATE INDEX IF NOT EXISTS idx_attendance_room ON attendance (chatroom_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_attendance_records_attendance_user ON attendance_records (attendance_id, user_id);
+    CREATE INDEX IF NOT EXISTS idx_attendance_records_user ON attendance_records (user_id);
+    CREATE INDEX IF NOT EXISTS idx_users_role_name ON users (role, name);
+    ''',
+    # 版本2：聊天室成员去重，并用唯一索引保证同一学生不会重复加入同一聊天室
+    '''
+    DELETE FROM chatroom_members WHERE id NOT IN (
+        SELECT MIN(id) FROM chatroom_members GROUP BY chatroom_id, user_id
+    );
+    DROP INDEX IF EXISTS idx_chatroom_members_room;
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_chatroom_members_room_user ON chatroom_members (chatroom_id, user_id);
+    ''',
+    # 版本3：答题记录和签到记录去重（保留最早的一条），并用唯一索引保证每人每题只答一次、每次签到只签一次
+    '''
+    DELETE FROM answers WHERE id NOT IN (
+        SELECT MIN(id) FROM answers GROUP BY question_id, user_id
+    );
+    DROP INDEX IF EXISTS idx_answers_question_user;
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_answers_question_user ON answers (question_id, user_id);
+    DELETE FROM attendance_records WHERE id NOT IN (
+        SELECT MIN(id) FROM attendance_records GROUP BY attendance_id, user_id
+    );
+    DROP INDEX IF EXISTS idx_attendance_records_attendance_user;
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_records_attendance_user ON attendance_records (attendance_id, user_id);
+    ''',
+    # 版本4：签到截止时间此前按服务器本地时间保存，而查询时与UTC的 datetime('now') 比较，统一转换为UTC
+    '''
+    UPDATE attendance SET expire_at = datetime(expire_at, 'utc') WHERE expire_at IS NOT NULL;
+    ''',
+    # 版本5：私人消息按会话键（聊天室ID:较小用户ID:较大用户ID，见 conversation_key）建索引，
+    # 取一个会话的记录只需一次索引范围扫描；每个用户的会话列表和未读数保存在 private_conversations 中，
+    # 由触发器在插入私人消息时增量更新（已有消息视为已读）
+    '''
+    ALTER TABLE messages ADD COLUMN conversation_key TEXT;
+    UPDATE messages
+    SET conversation_key = chatroom_id || ':' || MIN(sender_id, receiver_id) || ':' || MAX(sender_id, receiver_id)
+    WHERE type = 'private' AND receiver_id IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_key, id)
+        WHERE conversation_key IS NOT NULL;
+    
+    CREATE TABLE IF NOT EXISTS private_conversations (
+        user_id INTEGER NOT NULL,
+        chatroom_id INTEGER NOT NULL,
+        peer_id INTEGER NOT NULL,
+        conversation_key TEXT NOT NULL,
+        last_message_id INTEGER NOT NULL,
+        unread INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, chatroom_id, peer_id)
+    );
+    INSERT OR IGNORE INTO private_conversations (user_id, chatroom_id, peer_id, conversation_key, last_message_id)
+    SELECT user_id, chatroom_id, peer_id, conversation_key, MAX(id) FROM (
+        SELECT id, chatroom_id, sender_id AS user_id, receiver_id AS peer_id, conversation_key
+        FROM messages WHERE conversation_key IS NOT NULL
+        UNION ALL
+        SELECT id, chatroom_id, receiver_id, sender_id, conversation_key
+        FROM messages WHERE conversation_key IS NOT NULL
+    )
+    GROUP BY user_id, chatroom_id, peer_id;
+    
+    CREATE TRIGGER IF NOT EXISTS messages_private_conversations AFTER INSERT ON messages
+    WHEN new.conversation_key IS NOT NULL BEGIN
+        INSERT INTO private_conversations (user_id, chatroom_id, peer_id, conversation_key, last_message_id)
+        VALUES (new.sender_id, new.chatroom_id, new.receiver_id, new.conversation_key, new.id)
+        ON CONFLICT (user_id, chatroom_id, peer_id) DO UPDATE SET last_message_id = excluded.last_message_id;
+        INSERT INTO private_conversations (user_id, chatroom_id, peer_id, conversation_key, last_message_id, unread)
+        SELECT new.receiver_id, new.chatroom_id, new.sender_id, new.conversation_key, new.id, 1
+        WHERE new.receiver_id <> new.sender_id
+        ON CONFLICT (user_id, chatroom_id, peer_id) DO UPDATE
+        SET last_message_id = excluded.last_message_id, unread = unread + 1;
+    END;
+    ''',
+    # 版本6：多进程部署时各进程共享的在线状态（见 SharedPresenceRegistry）。
+    # 每个进程定期更新心跳，心跳过期的进程（异常退出）登记的连接视为已断开
+    '''
+    CREATE TABLE IF NOT EXISTS presence_workers (
+        worker_id TEXT PRIMARY KEY,
+        heartbeat_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS presence_connections (
+        worker_id TEXT NOT NULL,
+        sid TEXT NOT NULL,
+        chatroom_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        user_name TEXT,
+        PRIMARY KEY (worker_id, sid, chatroom_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_presence_connections_room_user ON presence_connections (chatroom_id, user_id);
+    ''',
+    # 版本7：记录限时签到实际关闭的时间。多进程部署时各进程都会到点关闭同一个签到，
+    # 只有把 closed_at 从空写为当前时间的进程广播结束通知（见 AttendanceScheduler）
+    '''
+    ALTER TABLE attendance ADD COLUMN closed_at TIMESTAMP;
+    ''',
+]
+
+# 执行尚未应用的迁移，每个版本在单独的事务中完成；指定 until 时只迁移到该版本
+def migrate_db(conn, until=None):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    until = len(MIGRATIONS) if until is None else until
+    for target_version, script in enumerate(MIGRATIONS[version:until], start=version + 1):
+        conn.executescript(f'''
+        BEGIN;
+        {script}
+        PRAGMA user_version = {target_version};
+        COMMIT;
+        ''')
+
+# 聊天记录全文索引：FTS5 外部内容表，正文仍只保存在 messages 中，由触发器保持同步。
+# trigram 分词按连续三个字符建索引，中文不需要分词词典也能做子串检索。
+# 需要 SQLite 3.34 以上且编译了 FTS5，旧版本不具备时不建索引，搜索退回逐条匹配，
+# 因此不放在 MIGRATIONS 中，而是每次启动时检查，SQLite 升级后会自动补建。
+MESSAGE_SEARCH_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+'''
+
+# 当前数据库是否已建立全文索引，由 init_db 设置
+message_search_fts = False
+
+# 建立聊天记录全文索引；首次建立时为已有消息补建索引。返回索引是否可用
+def ensure_message_search(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'").fetchone()
+    try:
+        conn.executescript(f'''
+        BEGIN;
+        {MESSAGE_SEARCH_SCHEMA}
+        {"" if exists else "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');"}
+        COMMIT;
+        ''')
+    except sqlite3.OperationalError as e:
+        if conn.in_transaction:
+            conn.rollback()
+        app.logger.warning(f'聊天记录全文索引不可用，搜索将逐条匹配: {e}')
+        return False
+    return True
+
+# 已经执行过 init_db 的数据库文件
+_initialized_databases = set()
+
+# 初始化数据库：建表并执行尚未应用的迁移。启动器在开始监听前显式调用；
+# 其他方式运行时（如直接导入本模块）在第一次取连接时自动调用，导入本模块本身不访问数据库
+def init_db(db_file=None, schema_version=None):
+    db_file = db_file or app.config['DATABASE']
+    os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
     
     # 创建用户表
@@ -131,18 +422,974 @@ def init_db():
     )
     ''')
     
-    # 提交更改并关闭连接
+    # 提交更改
     conn.commit()
+    
+    # 升级已有数据库的结构（schema_version 仅供基准测试建出旧版结构）
+    migrate_db(conn, schema_version)
+    if schema_version is not None:
+        conn.close()
+        return
+    
+    global message_search_fts
+    message_search_fts = ensure_message_search(conn)
+    
     conn.close()
+    _initialized_databases.add(os.path.abspath(db_file))
+
+# 数据库连接池：连接在请求之间复用，避免每次请求都重新打开数据库和编译语句
+class ConnectionPool:
+    def __init__(self, db_file, pool_size, journal_mode, synchronous, busy_timeout_ms, cached_statements):
+        self.db_file = db_file
+        self.pool_size = pool_size
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file,
+                               timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        return conn
+    
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+    
+    def release(self, conn):
+        # 丢弃未提交的事务，保证下一个使用者拿到干净的连接
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+    
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+# 从连接池借出的连接：用法与sqlite3连接相同，close()时归还连接池
+class PooledConnection:
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    # 以下方法额外记录执行耗时，按语句类型（SELECT/INSERT/...）分类
+    def _timed(self, operation, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            db_query_seconds.observe(time.perf_counter() - start, operation=operation)
+    
+    def execute(self, sql, parameters=()):
+        return self._timed(sql.split(None, 1)[0].upper(), self._conn.execute, sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(sql.split(None, 1)[0].upper(), self._conn.executemany, sql, seq_of_parameters)
+    
+    def commit(self):
+        return self._timed('COMMIT', self._conn.commit)
+    
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+# 辅助函数：按当前配置获取（必要时创建）连接池
+def get_db_pool():
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                if os.path.abspath(app.config['DATABASE']) not in _initialized_databases:
+                    init_db()
+                _db_pool = ConnectionPool(app.config['DATABASE'],
+                                          app.config['DB_POOL_SIZE'],
+                                          app.config['DB_JOURNAL_MODE'],
+                                          app.config['DB_SYNCHRONOUS'],
+                                          app.config['DB_BUSY_TIMEOUT_MS'],
+                                          app.config['DB_STATEMENT_CACHE_SIZE'])
+    return _db_pool
 
-# 初始化数据库
-init_db()
+# 辅助函数：关闭连接池（修改数据库配置后调用，下次使用时按新配置重建）
+def reset_db_pool():
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.close_all()
+        _db_pool = None
 
 # 辅助函数：获取数据库连接
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    pool = get_db_pool()
+    return PooledConnection(pool, pool.acquire())
+
+# 用户目录缓存：用户ID → 姓名/角色。用户信息极少变化，缓存后消息、答题和签到
+# 等高频路径不再需要逐条查询users表；导入学生名单或注册教师时整体失效。
+class UserDirectory:
+    def __init__(self):
+        self._users = {}
+        self._generation = 0
+    
+    def get(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        
+        user = self._users.get(user_id)
+        if user is not None:
+            return user
+        
+        generation = self._generation
+        conn = get_db_connection()
+        row = conn.execute('SELECT id, name, role FROM users WHERE id = ?', (user_id,)).fetchone()
+        conn.close()
+        
+        if row is None:
+            return None
+        
+        user = {'id': row['id'], 'name': row['name'], 'role': row['role']}
+        # 查询期间缓存被清空过，则不写回可能已过期的数据
+        if generation == self._generation:
+            self._users[user_id] = user
+        return user
+    
+    def name(self, user_id, default=None):
+        user = self.get(user_id)
+        return user['name'] if user else default
+    
+    def invalidate(self):
+        self._generation += 1
+        self._users = {}
+
+user_directory = UserDirectory()
+
+# 聊天室页面快照：聊天室信息、成员、题目和签到列表在一节课中很少变化，页面却会被每个学生反复加载，
+# 因此按聊天室缓存，按最近使用淘汰。题目、签到、成员变化时由对应的接口调用 invalidate()
+class RoomSnapshots:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = collections.OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+    
+    @staticmethod
+    def _load(conn, chatroom_id):
+        chatroom = conn.execute('SELECT * FROM chatrooms WHERE id = ?', (chatroom_id,)).fetchone()
+        if chatroom is None:
+            return None
+        
+        members = conn.execute('''
+            SELECT u.id, u.name, u.role FROM users u
+            JOIN chatroom_members cm ON u.id = cm.user_id
+            WHERE cm.chatroom_id = ?
+        ''', (chatroom_id,)).fetchall()
+        
+        questions = conn.execute('''
+            SELECT q.*, u.name as creator_name FROM questions q
+            JOIN users u ON q.creator_id = u.id
+            WHERE q.chatroom_id = ?
+            ORDER BY q.created_at DESC
+        ''', (chatroom_id,)).fetchall()
+        
+        # 保留UTC截止时间，渲染时再过滤掉缓存期间已经截止的签到
+        attendances = conn.execute('''
+            SELECT a.id, a.title, a.type, a.created_at, datetime(a.expire_at, 'localtime') AS expire_at,
+                   a.expire_at AS expire_at_utc
+            FROM attendance a
+            WHERE a.chatroom_id = ? AND (a.expire_at IS NULL OR a.expire_at > datetime('now'))
+            ORDER BY a.created_at DESC
+        ''', (chatroom_id,)).fetchall()
+        
+        return {
+            'chatroom': dict(chatroom),
+            'members': [dict(row) for row in members],
+            'questions': [dict(row) for row in questions],
+            'attendances': [dict(row) for row in attendances],
+        }
+    
+    def get(self, conn, chatroom_id):
+        """返回聊天室快照，聊天室不存在时返回None"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._snapshots.get(chatroom_id)
+            if cached is not None and now - cached[0] < app.config['ROOM_SNAPSHOT_TTL_S']:
+                self._snapshots.move_to_end(chatroom_id)
+                self._hits += 1
+                snapshot = cached[1]
+            else:
+                self._misses += 1
+                snapshot = None
+            generation = self._generation
+        
+        if snapshot is None:
+            snapshot = self._load(conn, chatroom_id)
+            if snapshot is None:
+                return None
+            with self._lock:
+                # 查询期间快照被清除过，则不写回可能已过期的数据
+                if self._generation == generation:
+                    self._snapshots[chatroom_id] = (now, snapshot)
+                    self._snapshots.move_to_end(chatroom_id)
+                    while len(self._snapshots) > app.config['ROOM_SNAPSHOT_MAX_ROOMS']:
+                        self._snapshots.popitem(last=False)
+        
+        now_utc = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        return dict(snapshot, attendances=[a for a in snapshot['attendances']
+                                           if a['expire_at_utc'] is None or a['expire_at_utc'] > now_utc])
+    
+    def invalidate(self, chatroom_id=None):
+        """清除一个聊天室的快照，不指定聊天室时全部清除"""
+        if chatroom_id is not None:
+            chatroom_id = int(chatroom_id)
+        with self._lock:
+            self._generation += 1
+            if chatroom_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(chatroom_id, None)
+    
+    def stats(self):
+        with self._lock:
+            return {'rooms': len(self._snapshots), 'hits': self._hits, 'misses': self._misses}
+
+room_snapshots = RoomSnapshots()
+
+# 消息后台写入器：分配消息ID后放入队列，后台任务每隔一个刷新周期把积累的消息在一个事务中批量写入
+class MessageWriter:
+    def __init__(self, flush_interval_ms, max_batch):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._id_lock = threading.Lock()
+        self._next_id = None
+        self._task = None
+        self._stopping = False
+    
+    def start(self):
+        # 从数据库中已用过的最大ID之后开始分配
+        conn = get_db_connection()
+        row = conn.execute('''
+            SELECT MAX(COALESCE((SELECT MAX(id) FROM messages), 0),
+                       COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'messages'), 0))
+        ''').fetchone()
+        conn.close()
+        self._next_id = row[0] + 1
+        self._task = socketio.start_background_task(self._run)
+    
+    def submit(self, sender_id, receiver_id, chatroom_id, content, message_type, key=None):
+        with self._id_lock:
+            message_id = self._next_id
+            self._next_id += 1
+        sent_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        self._queue.put((message_id, sender_id, receiver_id, chatroom_id, content, message_type, sent_at, key))
+        return message_id
+    
+    def _drain(self):
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _write(self, batch):
+        conn = get_db_connection()
+        try:
+            conn.executemany('''
+                INSERT INTO messages (id, sender_id, receiver_id, chatroom_id, content, type, sent_at, conversation_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+            conn.commit()
+        except sqlite3.Error:
+            # 批量写入失败时逐条重试，只丢弃确实无法写入的消息
+            conn.rollback()
+            for row in batch:
+                try:
+                    conn.execute('''
+                        INSERT INTO messages (id, sender_id, receiver_id, chatroom_id, content, type, sent_at, conversation_key)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', row)
+                    conn.commit()
+                except sqlite3.Error:
+                    conn.rollback()
+                    app.logger.exception(f'消息写入失败: id={row[0]}')
+        finally:
+            conn.close()
+    
+    def _run(self):
+        while not self._stopping:
+            socketio.sleep(self.flush_interval)
+            batch = self._drain()
+            while batch:
+                self._write(batch)
+                batch = self._drain()
+    
+    def pending(self):
+        return self._queue.qsize()
+    
+    def stop(self):
+        # 停止后台任务并把队列中剩余的消息全部写入
+        self._stopping = True
+        if self._task is not None:
+            self._task.join()
+            self._task = None
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+_message_writer = None
+_message_writer_lock = threading.Lock()
+
+# 辅助函数：获取（必要时启动）消息后台写入器
+def get_message_writer():
+    global _message_writer
+    if _message_writer is None:
+        with _message_writer_lock:
+            if _message_writer is None:
+                writer = MessageWriter(app.config['MESSAGE_FLUSH_INTERVAL_MS'],
+                                       app.config['MESSAGE_FLUSH_MAX_BATCH'])
+                writer.start()
+                _message_writer = writer
+    return _message_writer
+
+# 辅助函数：停止消息后台写入器并写入剩余消息（进程退出时自动调用）
+def stop_message_writer():
+    global _message_writer
+    with _message_writer_lock:
+        if _message_writer is not None:
+            _message_writer.stop()
+        _message_writer = None
+
+atexit.register(stop_message_writer)
+
+# 辅助函数：保存一条消息并返回消息ID，按配置选择同步写入或异步批量写入
+def save_message(sender_id, receiver_id, chatroom_id, content, message_type):
+    key = conversation_key(chatroom_id, sender_id, receiver_id) if message_type == 'private' else None
+    if app.config['MESSAGE_WRITE_BEHIND']:
+        return get_message_writer().submit(sender_id, receiver_id, chatroom_id, content, message_type, key)
+    
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        INSERT INTO messages (sender_id, receiver_id, chatroom_id, content, type, conversation_key)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (sender_id, receiver_id, chatroom_id, content, message_type, key))
+    message_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return message_id
+
+# 读取消息时返回的列。sent_at 按UTC保存（CURRENT_TIMESTAMP），转换为服务器本地时间，
+# 与实时推送中的 sent_at（datetime.now()）一致
+MESSAGE_COLUMNS = '''m.id, m.sender_id, m.receiver_id, m.chatroom_id, m.content, m.type,
+    datetime(m.sent_at, 'localtime') AS sent_at'''
+
+# 辅助函数：按消息ID倒序取一页公共消息（键集分页，before_id/after_id为游标），返回按时间正序排列的结果
+def fetch_public_messages(conn, chatroom_id, before_id=None, limit=None, after_id=None):
+    limit = limit or app.config['MESSAGE_PAGE_SIZE']
+    rows = conn.execute(f'''
+        SELECT {MESSAGE_COLUMNS}, u.name as sender_name, u.role as sender_role FROM messages m
+        JOIN users u ON m.sender_id = u.id
+        WHERE m.chatroom_id = ? AND m.type = 'public'
+        AND (? IS NULL OR m.id < ?)
+        AND (? IS NULL OR m.id > ?)
+        ORDER BY m.id DESC
+        LIMIT ?
+    ''', (chatroom_id, before_id, before_id, after_id, after_id, limit)).fetchall()
+    return rows[::-1]
+
+# 私聊会话键：同一聊天室中两名用户之间的私人消息共用一个键（用户ID按大小排列），与迁移版本5中的SQL表达式一致
+def conversation_key(chatroom_id, user_a, user_b):
+    user_a, user_b = sorted((int(user_a), int(user_b)))
+    return f'{int(chatroom_id)}:{user_a}:{user_b}'
+
+# 辅助函数：按消息ID倒序取一页当前用户相关的私人消息，返回按时间正序排列的结果。
+# 先从 private_conversations 取出该用户在聊天室中的会话，再按会话键索引读取，不扫描其他消息
+def fetch_private_messages(conn, chatroom_id, user_id, before_id=None, limit=None, after_id=None):
+    limit = limit or app.config['MESSAGE_PAGE_SIZE']
+    rows = conn.execute(f'''
+        SELECT {MESSAGE_COLUMNS}, u.name as sender_name, ur.name as receiver_name FROM messages m
+        JOIN users u ON m.sender_id = u.id
+        JOIN users ur ON m.receiver_id = ur.id
+        WHERE m.conversation_key IN (
+            SELECT conversation_key FROM private_conversations WHERE user_id = ? AND chatroom_id = ?
+        )
+        AND (? IS NULL OR m.id < ?)
+        AND (? IS NULL OR m.id > ?)
+        ORDER BY m.id DESC
+        LIMIT ?
+    ''', (user_id, chatroom_id, before_id, before_id, after_id, after_id, limit)).fetchall()
+    return rows[::-1]
+
+# 辅助函数：按消息ID倒序取一页与某个用户之间的私人消息（一次会话键索引范围读取），返回按时间正序排列的结果
+def fetch_conversation_messages(conn, chatroom_id, user_id, peer_id, before_id=None, limit=None):
+    limit = limit or app.config['MESSAGE_PAGE_SIZE']
+    rows = conn.execute(f'''
+        SELECT {MESSAGE_COLUMNS}, u.name as sender_name, ur.name as receiver_name FROM messages m
+        JOIN users u ON m.sender_id = u.id
+        JOIN users ur ON m.receiver_id = ur.id
+        WHERE m.conversation_key = ?
+        AND (? IS NULL OR m.id < ?)
+        ORDER BY m.id DESC
+        LIMIT ?
+    ''', (conversation_key(chatroom_id, user_id, peer_id), before_id, before_id, limit)).fetchall()
+    return rows[::-1]
+
+# 辅助函数：断线重连时的增量同步，只返回各数据流中客户端最后看到的ID之后的新数据。
+# 任一消息流缺失超过一页时返回 reload_required，由客户端重新加载页面。
+def fetch_sync_delta(chatroom_id, user_id, last_seen):
+    def cursor(key):
+        try:
+            return int(last_seen.get(key) or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    limit = app.config['MESSAGE_PAGE_MAX']
+    conn = get_db_connection()
+    
+    public_messages = fetch_public_messages(conn, chatroom_id, limit=limit + 1,
+                                            after_id=cursor('message_id'))
+    private_messages = fetch_private_messages(conn, chatroom_id, user_id, limit=limit + 1,
+                                              after_id=cursor('private_message_id'))
+    
+    questions = conn.execute('''
+        SELECT id, title, content, type, options, created_at FROM questions
+        WHERE chatroom_id = ? AND id > ?
+        ORDER BY id ASC
+    ''', (chatroom_id, cursor('question_id'))).fetchall()
+    
+    attendances = conn.execute('''
+        SELECT id, title, type, created_at, datetime(expire_at, 'localtime') AS expire_at FROM attendance
+        WHERE chatroom_id = ? AND id > ? AND (expire_at IS NULL OR expire_at > datetime('now'))
+        ORDER BY id ASC
+    ''', (chatroom_id, cursor('attendance_id'))).fetchall()
+    
+    conn.close()
+    
+    return {
+        'success': True,
+        'reload_required': len(public_messages) > limit or len(private_messages) > limit,
+        'messages': [dict(row) for row in public_messages[-limit:]],
+        'private_messages': [dict(row) for row in private_messages[-limit:]],
+        'questions': [dict(row, options=json.loads(row['options']) if row['options'] else None)
+                      for row in questions],
+        'attendances': [dict(row) for row in attendances]
+    }
+
+# 答题统计：每道题的作答人数、选项分布、正确率和作答用时中位数，常驻内存并增量更新。
+# 每次更新只读取上次统计之后新增的答案（按答案ID递增），首次访问某道题时即从答题记录完整重建；
+# 多进程部署时各进程都从数据库追赶，因此统计结果不会只包含本进程收到的答案。
+# 每道题有自己的锁，查询数据库时只阻塞同一道题的统计；早已结束的题目按最近访问淘汰。
+class AnswerStats:
+    def __init__(self, push_interval_ms):
+        self.push_interval = push_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._stats = collections.OrderedDict()   # 题目ID -> {'lock': 该题的锁, 'stats': 统计或None}
+        self._dirty = {}
+        self._push_scheduled = False
+    
+    def _load_question(self, conn, question_id):
+        question = conn.execute('''
+            SELECT id, creator_id, type, options, answer FROM questions WHERE id = ?
+        ''', (question_id,)).fetchone()
+        if question is None:
+            return None
+        
+        options = json.loads(question['options']) if question['options'] else []
+        return {
+            'question_id': question['id'],
+            'creator_id': question['creator_id'],
+            'type': question['type'],
+            'histogram': {str(index): 0 for index in range(len(options))} if question['type'] == 'choice' else None,
+            'responses': 0,
+            'scored': 0,
+            'correct': 0,
+            'durations': [],
+            'last_answer_id': 0
+        }
+    
+    def _entry(self, question_id):
+        with self._lock:
+            entry = self._stats.get(question_id)
+            if entry is None:
+                entry = self._stats[question_id] = {'lock': threading.Lock(), 'stats': None}
+            self._stats.move_to_end(question_id)
+            while len(self._stats) > app.config['ANSWER_STATS_MAX_QUESTIONS']:
+                self._stats.popitem(last=False)
+        return entry
+    
+    def _catch_up(self, question_id, entry):
+        # 调用方需持有 entry['lock']
+        conn = get_db_connection()
+        try:
+            stats = entry['stats']
+            if stats is None:
+                stats = self._load_question(conn, question_id)
+                if stats is None:
+                    return None
+                entry['stats'] = stats
+            
+            rows = conn.execute('''
+                SELECT a.id, a.content, a.score,
+                       (julianday(a.submitted_at) - julianday(q.created_at)) * 86400 AS seconds
+                FROM answers a JOIN questions q ON q.id = a.question_id
+                WHERE a.question_id = ? AND a.id > ?
+                ORDER BY a.id ASC
+            ''', (question_id, stats['last_answer_id'])).fetchall()
+        finally:
+            conn.close()
+        
+        for row in rows:
+            stats['responses'] += 1
+            if stats['histogram'] is not None:
+                stats['histogram'][row['content']] = stats['histogram'].get(row['content'], 0) + 1
+            if row['score'] is not None:
+                stats['scored'] += 1
+                if row['score'] >= 100:
+                    stats['correct'] += 1
+            if row['seconds'] is not None:
+                bisect.insort(stats['durations'], max(row['seconds'], 0.0))
+            stats['last_answer_id'] = row['id']
+        return stats
+    
+    def get(self, question_id):
+        question_id = int(question_id)
+        entry = self._entry(question_id)
+        with entry['lock']:
+            stats = self._catch_up(question_id, entry)
+            if stats is None:
+                with self._lock:
+                    if self._stats.get(question_id) is entry:
+                        del self._stats[question_id]
+                return None
+            
+            durations = stats['durations']
+            middle = len(durations) // 2
+            if not durations:
+                median = None
+            elif len(durations) % 2:
+                median = durations[middle]
+            else:
+                median = (durations[middle - 1] + durations[middle]) / 2
+            
+            return {
+                'question_id': stats['question_id'],
+                'creator_id': stats['creator_id'],
+                'type': stats['type'],
+                'responses': stats['responses'],
+                'histogram': dict(stats['histogram']) if stats['histogram'] is not None else None,
+                'correct_rate': round(stats['correct'] / stats['scored'], 4) if stats['scored'] else None,
+                'median_seconds': round(median, 1) if median is not None else None
+            }
+    
+    def pending(self):
+        with self._lock:
+            return len(self._dirty)
+    
+    def notify(self, question_id, creator_id):
+        # 合并推送：同一推送周期内的多次提交只向教师发送一次最新统计
+        with self._lock:
+            self._dirty[int(question_id)] = creator_id
+            if self._push_scheduled:
+                return
+            self._push_scheduled = True
+        socketio.start_background_task(self._push_later)
+    
+    def _push_later(self):
+        socketio.sleep(self.push_interval)
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._push_scheduled = False
+        for question_id, creator_id in dirty.items():
+            stats = self.get(question_id)
+            if stats is not None:
+                socketio.emit('answer_stats', stats, room=f'user_{creator_id}')
+
+_answer_stats = None
+_answer_stats_lock = threading.Lock()
+
+# 辅助函数：获取答题统计（首次调用时按配置创建）
+def get_answer_stats():
+    global _answer_stats
+    if _answer_stats is None:
+        with _answer_stats_lock:
+            if _answer_stats is None:
+                _answer_stats = AnswerStats(app.config['ANSWER_STATS_PUSH_INTERVAL_MS'])
+    return _answer_stats
+
+# 聊天室广播合并：开启后同一房间在一个合并窗口内的事件打包成一个 batch 帧发送，
+# 签到、入场等集中发生的事件不再让每个客户端收到（并逐条渲染）几十个单独的帧。
+class BroadcastBatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._counters = {'events': 0, 'frames': 0, 'batches': 0, 'client_frames_saved': 0}
+    
+    def emit(self, event, data, room):
+        window_ms = app.config['BROADCAST_BATCH_WINDOW_MS']
+        if window_ms <= 0:
+            socketio.emit(event, data, room=room)
+            with self._lock:
+                self._counters['events'] += 1
+                self._counters['frames'] += 1
+            return
+        
+        with self._lock:
+            self._counters['events'] += 1
+            events = self._pending.get(room)
+            if events is not None:
+                events.append({'event': event, 'data': data})
+                return
+            self._pending[room] = [{'event': event, 'data': data}]
+        socketio.start_background_task(self._flush_later, room, window_ms / 1000)
+    
+    def _flush_later(self, room, window):
+        socketio.sleep(window)
+        with self._lock:
+            events = self._pending.pop(room, [])
+        if not events:
+            return
+        
+        if len(events) == 1:
+            socketio.emit(events[0]['event'], events[0]['data'], room=room)
+        else:
+            socketio.emit('batch', events, room=room)
+        
+        # 按本进程中该房间的连接数估算客户端少收的帧数
+        recipients = len(socketio.server.manager.rooms.get('/', {}).get(room, ()))
+        with self._lock:
+            self._counters['frames'] += 1
+            if len(events) > 1:
+                self._counters['batches'] += 1
+                self._counters['client_frames_saved'] += (len(events) - 1) * recipients
+    
+    def pending(self):
+        with self._lock:
+            return sum(len(events) for events in self._pending.values())
+    
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters['frames_saved'] = counters['events'] - counters['frames']
+        return counters
+
+broadcaster = BroadcastBatcher()
+
+# 限时签到调度：进行中的限时签到保存在内存中，学生签到时直接查表，不再每次按时间条件查询数据库。
+# 截止时间按小顶堆排列，后台任务等到最近的截止时间关闭签到并通知聊天室，关闭后即从内存中移除；
+# 本进程没有记录的签到（其他进程创建或重启前创建）在首次访问时从数据库加载。
+# 不限时的签到和已结束的签到不常驻内存，每次按主键查询数据库。
+class AttendanceScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}
+        self._deadlines = []
+        self._wakeup = None
+        self._task = None
+    
+    @staticmethod
+    def _deadline(expire_at):
+        # expire_at 以UTC保存，格式与 CURRENT_TIMESTAMP 相同
+        if not expire_at:
+            return None
+        return datetime.strptime(expire_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    
+    def start(self):
+        self._wakeup = socketio.server.eio.create_event()
+        
+        conn = get_db_connection()
+        rows = conn.execute('''
+            SELECT id, chatroom_id, type, password, expire_at FROM attendance
+            WHERE expire_at > datetime('now')
+        ''').fetchall()
+        conn.close()
+        for row in rows:
+            self.add(row['id'], row['chatroom_id'], row['type'], row['password'], row['expire_at'])
+        
+        self._task = socketio.start_background_task(self._run)
+    
+    def add(self, attendance_id, chatroom_id, attendance_type, password, expire_at):
+        session_info = {'id': attendance_id, 'chatroom_id': chatroom_id, 'type': attendance_type,
+                        'password': password, 'deadline': self._deadline(expire_at)}
+        if session_info['deadline'] is None:
+            return session_info
+        with self._lock:
+            self._open[attendance_id] = session_info
+            heapq.heappush(self._deadlines, (session_info['deadline'], attendance_id))
+            is_next = self._deadlines[0][1] == attendance_id
+        # 新的截止时间早于当前等待的时间时唤醒后台任务重新计时
+        if is_next and self._wakeup is not None:
+            self._wakeup.set()
+        return session_info
+    
+    def lookup(self, attendance_id):
+        try:
+            attendance_id = int(attendance_id)
+        except (TypeError, ValueError):
+            return None
+        
+        with self._lock:
+            session_info = self._open.get(attendance_id)
+        
+        if session_info is None:
+            conn = get_db_connection()
+            row = conn.execute('''
+                SELECT id, chatroom_id, type, password, expire_at,
+                       expire_at IS NULL OR expire_at > datetime('now') AS is_open
+                FROM attendance WHERE id = ?
+            ''', (attendance_id,)).fetchone()
+            conn.close()
+            
+            if row is None or not row['is_open']:
+                return None
+            session_info = self.add(row['id'], row['chatroom_id'], row['type'], row['password'], row['expire_at'])
+        
+        # 截止时间已到但后台任务尚未处理时同样视为已结束
+        if session_info['deadline'] is not None and session_info['deadline'] <= time.time():
+            return None
+        return session_info
+    
+    def open_sessions(self):
+        with self._lock:
+            return len(self._open)
+    
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                timeout = self._deadlines[0][0] - time.time() if self._deadlines else None
+            if timeout is None or timeout > 0:
+                self._wakeup.wait(timeout)
+            
+            due = []
+            with self._lock:
+                now = time.time()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    _, attendance_id = heapq.heappop(self._deadlines)
+                    session_info = self._open.pop(attendance_id, None)
+                    if session_info is not None:
+                        due.append(session_info)
+            
+            for session_info in due:
+                if self._mark_closed(session_info['id']):
+                    socketio.emit('attendance_closed', {'attendance_id': session_info['id']},
+                                  room=f'chatroom_{session_info["chatroom_id"]}')
+    
+    @staticmethod
+    def _mark_closed(attendance_id):
+        """记录签到已关闭，返回是否由本进程关闭（多进程时只有一个进程返回True）"""
+        try:
+            conn = get_db_connection()
+            cursor = conn.execute('UPDATE attendance SET closed_at = CURRENT_TIMESTAMP WHERE id = ? AND closed_at IS NULL',
+                                  (attendance_id,))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            # 写入失败时仍然通知，客户端会忽略重复的结束通知
+            app.logger.warning(f'记录签到关闭时间失败: {e}')
+            return True
+        return cursor.rowcount == 1
+
+_attendance_scheduler = None
+_attendance_scheduler_lock = threading.Lock()
+
+# 辅助函数：获取（必要时启动）限时签到调度器
+def get_attendance_scheduler():
+    global _attendance_scheduler
+    if _attendance_scheduler is None:
+        with _attendance_scheduler_lock:
+            if _attendance_scheduler is None:
+                scheduler = AttendanceScheduler()
+                scheduler.start()
+                _attendance_scheduler = scheduler
+    return _attendance_scheduler
+
+# 写操作限流：令牌桶。每个桶按固定速率补充令牌、最多积累到桶容量，每次操作消耗一个令牌。
+# 一次操作可同时受多个桶约束（如发送者本人和所在聊天室），只有全部放行时才扣除令牌。
+# 当前实现保存在进程内存中；多进程部署需要全局限流时，可替换为同样接口的共享存储实现。
+class MemoryRateLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._rejected = {}
+    
+    def acquire(self, buckets):
+        """buckets 为 [(键, 每秒令牌数, 桶容量), ...]；放行时返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            states = []
+            wait = 0.0
+            for key, rate, burst in buckets:
+                tokens, updated = self._buckets.get(key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                states.append((key, tokens))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            
+            if wait:
+                for key, tokens in states:
+                    self._buckets[key] = (tokens, now)
+                    if tokens < 1:
+                        scope = key.rsplit(':', 1)[0]
+                        self._rejected[scope] = self._rejected.get(scope, 0) + 1
+                return wait
+            
+            for key, tokens in states:
+                self._buckets[key] = (tokens - 1, now)
+            return 0
+    
+    def stats(self):
+        with self._lock:
+            return {'buckets': len(self._buckets), 'rejected': dict(self._rejected)}
+
+rate_limiter = MemoryRateLimiter()
+
+# 辅助函数：检查写操作频率，放行时返回 None，超出限制时返回 (错误结果, 429)
+def check_rate_limit(action, user_id, chatroom_id=None):
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return None
+    
+    limits = app.config['RATE_LIMITS'].get(action, {})
+    buckets = []
+    if limits.get('user'):
+        buckets.append((f'{action}:user:{user_id}', *limits['user']))
+    if limits.get('room') and chatroom_id:
+        buckets.append((f'{action}:room:{chatroom_id}', *limits['room']))
+    
+    wait = rate_limiter.acquire(buckets) if buckets else 0
+    if not wait:
+        return None
+    return {'success': False, 'error': '操作过于频繁，请稍后再试', 'retry_after': round(wait, 1)}, 429
+
+# 辅助函数：把 (结果, HTTP状态码) 转换为JSON响应，被限流时附带 Retry-After 头
+def json_response(result, status):
+    response = jsonify(result)
+    response.status_code = status
+    if status == 429:
+        response.headers['Retry-After'] = str(math.ceil(result['retry_after']))
+    return response
+
+# HTTP请求计时：每个路由的处理耗时（含模板渲染），超过 SLOW_REQUEST_MS 的请求写入日志
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else '未匹配'
+        http_request_seconds.observe(elapsed, method=request.method, route=route,
+                                     status=response.status_code)
+        if elapsed * 1000 >= app.config['SLOW_REQUEST_MS']:
+            app.logger.warning(f'慢请求: {request.method} {request.path} {elapsed * 1000:.0f}ms')
+    return response
+
+# 压缩页面和JSON响应；文件下载、流式导出等响应原样返回
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']
+            or not request.accept_encodings['gzip']):
+        return response
+    
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL']))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+# 输出时现场计算的仪表：连接数、各队列长度和各组件的累计统计
+def _room_connections():
+    rooms = socketio.server.manager.rooms.get('/', {})
+    return {(room,): len(sids) for room, sids in list(rooms.items())
+            if isinstance(room, str) and room.startswith('chatroom_')}
+
+metrics.gauge('classroom_socket_connections', '当前WebSocket连接数', lambda: _socket_connections)
+metrics.gauge('classroom_room_connections', '各聊天室房间中的连接数（本进程）', _room_connections, ('room',))
+metrics.gauge('classroom_db_pool_idle_connections', '连接池中的空闲连接数',
+              lambda: len(_db_pool._idle) if _db_pool is not None else 0)
+metrics.gauge('classroom_message_write_queue', '等待异步写入数据库的消息数',
+              lambda: _message_writer.pending() if _message_writer is not None else 0)
+metrics.gauge('classroom_broadcast_pending_events', '等待合并发送的广播事件数', lambda: broadcaster.pending())
+metrics.gauge('classroom_broadcast_batcher', '广播合并累计统计',
+              lambda: {(name,): value for name, value in broadcaster.stats().items()}, ('stat',))
+metrics.gauge('classroom_answer_stats_pending_pushes', '等待推送给教师的答题统计数',
+              lambda: _answer_stats.pending() if _answer_stats is not None else 0)
+metrics.gauge('classroom_attendance_open_sessions', '进行中的签到数（本进程已加载）',
+              lambda: _attendance_scheduler.open_sessions() if _attendance_scheduler is not None else 0)
+metrics.gauge('classroom_room_snapshots', '聊天室页面快照缓存的聊天室数及累计命中、未命中次数',
+              lambda: {(name,): value for name, value in room_snapshots.stats().items()}, ('stat',))
+metrics.gauge('classroom_online_users', '各聊天室在线用户数（多进程部署时为所有进程合计）',
+              lambda: {(f'chatroom_{room}',): count for room, count in presence.room_counts().items()}, ('room',))
+metrics.gauge('classroom_rate_limited_requests', '各类写操作被限流拒绝的累计次数',
+              lambda: {tuple(scope.split(':')): count for scope, count in rate_limiter.stats()['rejected'].items()},
+              ('action', 'scope'))
+
+# 辅助函数：按固定间隔把全部指标追加写入日志目录（启动器 --metrics-interval 开启）
+def start_metrics_dump(log_dir, interval_s):
+    def dump():
+        while True:
+            socketio.sleep(interval_s)
+            path = os.path.join(log_dir, f'metrics_{datetime.now():%Y%m%d}.prom')
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(f'# {datetime.now():%Y-%m-%d %H:%M:%S}\n{metrics.render()}\n')
+            except OSError:
+                app.logger.exception(f'写入运行指标失败: {path}')
+    
+    return socketio.start_background_task(dump)
+
+# 路由：静态资源。带哈希的地址内容不会变化，允许浏览器长期缓存；
+# 不带哈希的地址（如字体文件的原始路径）每次使用前按ETag确认。按浏览器支持返回预先压缩好的版本
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    asset, immutable = assets.find(filename)
+    if asset is None:
+        return jsonify({'success': False, 'error': '文件不存在'}), 404
+    
+    encoding = asset.choose_encoding(request.accept_encodings)
+    response = Response(asset.encodings[encoding], mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(asset.etag(encoding))
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={app.config["ASSET_MAX_AGE"]}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 # 路由：首页
 @app.route('/')
@@ -190,6 +1437,7 @@ def teacher_register():
         conn.execute('INSERT INTO users (name, role, password) VALUES (?, ?, ?)', 
                     (username, 'teacher', hashed_password))
         conn.commit()
+        user_directory.invalidate()
         
         teacher = conn.execute('SELECT * FROM users WHERE name = ? AND role = ?', 
                               (username, 'teacher')).fetchone()
@@ -215,6 +1463,69 @@ def teacher_dashboard():
     
     return render_template('teacher_dashboard.html', chatrooms=chatrooms)
 
+# 读取上传的名单文件，返回去除首尾空白后的姓名列（Series）；CSV走快速路径，文件不落盘
+def read_roster_names(data, filename):
+    # pandas 导入耗时较长，只在导入名单时加载，不拖慢系统启动
+    import pandas as pd
+    
+    # 只读取"姓名"列，其余列不解析
+    is_name_column = lambda column: str(column).strip() == '姓名'
+    
+    if filename.lower().endswith('.csv'):
+        # Excel另存的CSV常见为GBK编码
+        for encoding in ('utf-8-sig', 'gbk'):
+            try:
+                df = pd.read_csv(io.BytesIO(data), usecols=is_name_column, dtype=str, encoding=encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ValueError('无法识别CSV文件编码，请保存为UTF-8或GBK编码')
+    else:
+        df = pd.read_excel(io.BytesIO(data), usecols=is_name_column, dtype=str)
+    
+    if df.shape[1] == 0:
+        return None
+    
+    # 合并连续空白（包括全角空格）并去除首尾空白
+    return df.iloc[:, 0].str.replace(r'\s+', ' ', regex=True).str.strip()
+
+# 批量导入学生：文件内去重、跳过已存在的学生，在一个事务中批量插入，返回导入报告
+def bulk_import_students(data, filename):
+    started = time.perf_counter()
+    names = read_roster_names(data, filename)
+    if names is None:
+        return None
+    
+    total = len(names)
+    names = names[names.notna() & (names != '')]
+    blank = total - len(names)
+    
+    unique_names = names.drop_duplicates()
+    duplicates = len(names) - len(unique_names)
+    parsed = time.perf_counter()
+    
+    conn = get_db_connection()
+    # 立即获取写锁，避免两次导入同时执行时重复插入
+    conn.execute('BEGIN IMMEDIATE')
+    existing = {row['name'] for row in conn.execute('SELECT name FROM users WHERE role = ?', ('student',))}
+    new_names = unique_names[~unique_names.isin(existing)]
+    conn.executemany('INSERT INTO users (name, role) VALUES (?, ?)',
+                     ((name, 'student') for name in new_names))
+    conn.commit()
+    conn.close()
+    finished = time.perf_counter()
+    
+    return {
+        'total': total,
+        'inserted': len(new_names),
+        'existing': len(unique_names) - len(new_names),
+        'duplicates': duplicates,
+        'blank': blank,
+        'parse_ms': round((parsed - started) * 1000, 1),
+        'db_ms': round((finished - parsed) * 1000, 1),
+    }
+
 # 路由：导入学生名单
 @app.route('/teacher/import_students', methods=['GET', 'POST'])
 def import_students():
@@ -229,31 +1540,24 @@ def import_students():
         if file.filename == '':
             return render_template('import_students.html', error='没有选择文件')
         
-        if file and file.filename.endswith(('.xls', '.xlsx')):
+        if file and file.filename.lower().endswith(('.xls', '.xlsx', '.csv')):
+            limited = check_rate_limit('publish', session['user_id'])
+            if limited:
+                return json_response(*limited)
+            
             try:
-                # 保存上传的文件
-                file_path = os.path.join(os.path.dirname(__file__), '..', 'uploads', file.filename)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                file.save(file_path)
-                
-                # 读取Excel文件
-                df = pd.read_excel(file_path)
+                # 直接从上传内容读取，不再保存到uploads目录
+                report = bulk_import_students(file.read(), file.filename)
                 
                 # 检查是否有"姓名"列
-                if '姓名' not in df.columns:
-                    return render_template('import_students.html', error='Excel文件必须包含"姓名"列')
+                if report is None:
+                    return render_template('import_students.html', error='文件必须包含"姓名"列')
                 
-                # 导入学生名单
-                conn = get_db_connection()
-                for _, row in df.iterrows():
-                    name = row['姓名']
-                    conn.execute('INSERT INTO users (name, role) VALUES (?, ?)', 
-                                (name, 'student'))
-                
-                conn.commit()
-                conn.close()
+                if report['inserted']:
+                    user_directory.invalidate()
+                    room_snapshots.invalidate()
                 
-                return redirect(url_for('teacher_dashboard'))
+                return render_template('import_students.html', report=report)
             except Exception as e:
                 return render_template('import_students.html', error=f'导入失败：{str(e)}')
         
@@ -269,26 +1573,49 @@ def create_chatroom():
     
     if request.method == 'POST':
         name = request.form.get('name')
+        source_chatroom_id = request.form.get('source_chatroom_id', type=int)
+        
+        limited = check_rate_limit('publish', session['user_id'])
+        if limited:
+            return json_response(*limited)
         
         conn = get_db_connection()
         cursor = conn.execute('INSERT INTO chatrooms (name, creator_id) VALUES (?, ?)', 
                             (name, session['user_id']))
         chatroom_id = cursor.lastrowid
         
-        # 获取所有学生
-        students = conn.execute('SELECT * FROM users WHERE role = ?', ('student',)).fetchall()
-        
-        # 将学生添加到聊天室
-        for student in students:
-            conn.execute('INSERT INTO chatroom_members (chatroom_id, user_id) VALUES (?, ?)', 
-                        (chatroom_id, student['id']))
+        # 将学生添加到聊天室：指定了已有聊天室时沿用其成员名单，否则添加所有学生
+        if source_chatroom_id:
+            conn.execute('''
+                INSERT OR IGNORE INTO chatroom_members (chatroom_id, user_id)
+                SELECT ?, cm.user_id FROM chatroom_members cm
+                JOIN chatrooms c ON cm.chatroom_id = c.id
+                WHERE cm.chatroom_id = ? AND c.creator_id = ?
+            ''', (chatroom_id, source_chatroom_id, session['user_id']))
+        else:
+            conn.execute('''
+                INSERT OR IGNORE INTO chatroom_members (chatroom_id, user_id)
+                SELECT ?, id FROM users WHERE role = ?
+            ''', (chatroom_id, 'student'))
         
         conn.commit()
         conn.close()
+        room_snapshots.invalidate(chatroom_id)
         
         return redirect(url_for('teacher_dashboard'))
     
-    return render_template('create_chatroom.html')
+    # 可沿用成员名单的已有聊天室
+    conn = get_db_connection()
+    chatrooms = conn.execute('''
+        SELECT c.id, c.name, COUNT(cm.id) as member_count FROM chatrooms c
+        LEFT JOIN chatroom_members cm ON cm.chatroom_id = c.id
+        WHERE c.creator_id = ?
+        GROUP BY c.id
+        ORDER BY c.created_at DESC
+    ''', (session['user_id'],)).fetchall()
+    conn.close()
+    
+    return render_template('create_chatroom.html', chatrooms=chatrooms)
 
 # 路由：学生选择页面
 @app.route('/student')
@@ -325,9 +1652,7 @@ def student_select_name():
     user_id = request.form.get('user_id')
     chatroom_id = request.form.get('chatroom_id')
     
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-    conn.close()
+    user = user_directory.get(user_id)
     
     if not user:
         return redirect(url_for('student_select'))
@@ -346,51 +1671,18 @@ def chatroom(chatroom_id):
         return redirect(url_for('index'))
     
     conn = get_db_connection()
-    chatroom = conn.execute('SELECT * FROM chatrooms WHERE id = ?', (chatroom_id,)).fetchone()
+    # 聊天室信息、成员、题目和进行中的签到取自快照，只有与当前用户相关的部分每次查询
+    snapshot = room_snapshots.get(conn, chatroom_id)
     
-    if not chatroom:
+    if not snapshot:
         conn.close()
         return redirect(url_for('index'))
     
-    # 获取聊天室成员
-    members = conn.execute('''
-        SELECT u.* FROM users u
-        JOIN chatroom_members cm ON u.id = cm.user_id
-        WHERE cm.chatroom_id = ?
-    ''', (chatroom_id,)).fetchall()
+    # 获取最近的公共消息（更早的消息由前端滚动时分页加载）
+    public_messages = fetch_public_messages(conn, chatroom_id)
     
-    # 获取公共消息
-    public_messages = conn.execute('''
-        SELECT m.*, u.name as sender_name FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        WHERE m.chatroom_id = ? AND m.type = 'public'
-        ORDER BY m.sent_at ASC
-    ''', (chatroom_id,)).fetchall()
-    
-    # 获取私人消息
-    private_messages = conn.execute('''
-        SELECT m.*, u.name as sender_name, ur.name as receiver_name FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        JOIN users ur ON m.receiver_id = ur.id
-        WHERE m.chatroom_id = ? AND m.type = 'private'
-        AND (m.sender_id = ? OR m.receiver_id = ?)
-        ORDER BY m.sent_at ASC
-    ''', (chatroom_id, session['user_id'], session['user_id'])).fetchall()
-    
-    # 获取题目
-    questions = conn.execute('''
-        SELECT q.*, u.name as creator_name FROM questions q
-        JOIN users u ON q.creator_id = u.id
-        WHERE q.chatroom_id = ?
-        ORDER BY q.created_at DESC
-    ''', (chatroom_id,)).fetchall()
-    
-    # 获取签到
-    attendances = conn.execute('''
-        SELECT a.* FROM attendance a
-        WHERE a.chatroom_id = ? AND (a.expire_at IS NULL OR a.expire_at > datetime('now'))
-        ORDER BY a.created_at DESC
-    ''', (chatroom_id,)).fetchall()
+    # 获取最近的私人消息
+    private_messages = fetch_private_messages(conn, chatroom_id, session['user_id'])
     
     # 获取已签到记录
     attendance_records = conn.execute('''
@@ -402,105 +1694,276 @@ def chatroom(chatroom_id):
     conn.close()
     
     return render_template('chatroom.html', 
-                          chatroom=chatroom, 
-                          members=members, 
+                          chatroom=snapshot['chatroom'], 
+                          members=snapshot['members'], 
                           public_messages=public_messages, 
                           private_messages=private_messages,
-                          questions=questions,
-                          attendances=attendances,
-                          attendance_records=attendance_records)
+                          questions=snapshot['questions'],
+                          attendances=snapshot['attendances'],
+                          attendance_records=attendance_records,
+                          message_page_size=app.config['MESSAGE_PAGE_SIZE'])
 
-# API：发送公共消息
-@app.route('/api/message/public', methods=['POST'])
-def send_public_message():
+# API：分页获取历史消息（向上滚动时加载更早的消息）
+@app.route('/api/messages/<int:chatroom_id>')
+def get_message_history(chatroom_id):
     if not session.get('user_id'):
         return jsonify({'success': False, 'error': '未登录'}), 401
     
-    data = request.get_json()
-    content = data.get('content')
-    chatroom_id = data.get('chatroom_id')
+    message_type = request.args.get('type', 'public')
+    if message_type not in ('public', 'private'):
+        return jsonify({'success': False, 'error': '消息类型错误'}), 400
     
-    if not content or not chatroom_id:
-        return jsonify({'success': False, 'error': '缺少必要参数'}), 400
+    before_id = request.args.get('before_id', type=int)
+    limit = request.args.get('limit', app.config['MESSAGE_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['MESSAGE_PAGE_MAX']))
     
     conn = get_db_connection()
-    cursor = conn.execute('''
-        INSERT INTO messages (sender_id, chatroom_id, content, type)
-        VALUES (?, ?, ?, ?)
-    ''', (session['user_id'], chatroom_id, content, 'public'))
+    # 多取一条用于判断是否还有更早的消息
+    if message_type == 'public':
+        rows = fetch_public_messages(conn, chatroom_id, before_id, limit + 1)
+    else:
+        rows = fetch_private_messages(conn, chatroom_id, session['user_id'], before_id, limit + 1)
+    conn.close()
     
-    message_id = cursor.lastrowid
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[1:]
     
-    # 获取发送者信息
-    sender = conn.execute('SELECT name FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+    return jsonify({
+        'success': True,
+        'messages': [dict(row) for row in rows],
+        'has_more': has_more,
+        'next_before_id': rows[0]['id'] if rows else None
+    })
+
+# 辅助函数：在聊天室中搜索当前用户可见的消息（公共消息，以及本人发出或收到的私人消息）。
+# 关键词按空格拆分，须全部出现。每个关键词都不少于3个字符时走全文索引并按相关度排序，
+# 否则（trigram 索引无法匹配一两个字的词）在该聊天室的消息中逐条匹配，按时间倒序排列。
+def search_messages(conn, chatroom_id, user_id, query, offset=0, limit=None):
+    limit = limit or app.config['MESSAGE_SEARCH_PAGE_SIZE']
+    terms = query.split()
+    visible = '''m.chatroom_id = ? AND (m.type = 'public'
+        OR (m.type = 'private' AND (m.sender_id = ? OR m.receiver_id = ?)))'''
+    columns = f'''{MESSAGE_COLUMNS}, u.name AS sender_name, ur.name AS receiver_name'''
+    
+    if message_search_fts and all(len(term) >= 3 for term in terms):
+        # 每个关键词作为短语加引号，避免用户输入被当作 FTS5 查询语法
+        match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        return conn.execute(f'''
+            SELECT {columns}, snippet(messages_fts, 0, char(2), char(3), '…', 32) AS snippet
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN users u ON m.sender_id = u.id
+            LEFT JOIN users ur ON m.receiver_id = ur.id
+            WHERE messages_fts MATCH ? AND {visible}
+            ORDER BY messages_fts.rank, m.id DESC
+            LIMIT ? OFFSET ?
+        ''', (match, chatroom_id, user_id, user_id, limit, offset)).fetchall()
+    
+    patterns = ['%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                for term in terms]
+    like = ' AND '.join("m.content LIKE ? ESCAPE '\\'" for _ in patterns)
+    return conn.execute(f'''
+        SELECT {columns}, NULL AS snippet
+        FROM messages m
+        JOIN users u ON m.sender_id = u.id
+        LEFT JOIN users ur ON m.receiver_id = ur.id
+        WHERE {visible} AND {like}
+        ORDER BY m.id DESC
+        LIMIT ? OFFSET ?
+    ''', (chatroom_id, user_id, user_id, *patterns, limit, offset)).fetchall()
+
+# API：搜索聊天记录，按相关度分页返回。snippet 为命中片段，关键词前后分别以 \x02、\x03 标记
+@app.route('/api/messages/<int:chatroom_id>/search')
+def search_message_history(chatroom_id):
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': '未登录'}), 401
     
-    conn.commit()
-    conn.close()
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': '缺少搜索关键词'}), 400
+    if len(query) > app.config['MESSAGE_SEARCH_MAX_QUERY']:
+        return jsonify({'success': False, 'error': '搜索关键词过长'}), 400
     
-    # 通过WebSocket广播消息
-    socketio.emit('new_message', {
-        'id': message_id,
-        'sender_id': session['user_id'],
-        'sender_name': sender['name'],
-        'content': content,
-        'type': 'public',
-        'sent_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }, room=f'chatroom_{chatroom_id}')
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = request.args.get('limit', app.config['MESSAGE_SEARCH_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['MESSAGE_PAGE_MAX']))
     
-    return jsonify({'success': True})
+    conn = get_db_connection()
+    # 多取一条用于判断是否还有下一页
+    rows = search_messages(conn, chatroom_id, session['user_id'], query, offset, limit + 1)
+    conn.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        'success': True,
+        'messages': [dict(row) for row in rows],
+        'has_more': has_more,
+        'next_offset': offset + len(rows) if has_more else None
+    })
 
-# API：发送私人消息
-@app.route('/api/message/private', methods=['POST'])
-def send_private_message():
+# API：当前用户在聊天室中的私聊会话列表及各会话未读数
+@app.route('/api/messages/<int:chatroom_id>/conversations')
+def get_conversations(chatroom_id):
     if not session.get('user_id'):
         return jsonify({'success': False, 'error': '未登录'}), 401
     
-    data = request.get_json()
-    content = data.get('content')
-    chatroom_id = data.get('chatroom_id')
-    receiver_id = data.get('receiver_id')
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT pc.peer_id, u.name AS peer_name, pc.unread, pc.last_message_id
+        FROM private_conversations pc
+        JOIN users u ON pc.peer_id = u.id
+        WHERE pc.user_id = ? AND pc.chatroom_id = ?
+        ORDER BY pc.last_message_id DESC
+    ''', (session['user_id'], chatroom_id)).fetchall()
+    conn.close()
     
-    if not content or not chatroom_id or not receiver_id:
-        return jsonify({'success': False, 'error': '缺少必要参数'}), 400
+    return jsonify({
+        'success': True,
+        'conversations': [dict(row) for row in rows],
+        'total_unread': sum(row['unread'] for row in rows)
+    })
+
+# API：分页获取与某个用户的私聊记录（打开会话、向上滚动时加载更早的消息）
+@app.route('/api/messages/<int:chatroom_id>/conversation/<int:peer_id>')
+def get_conversation_history(chatroom_id, peer_id):
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': '未登录'}), 401
+    
+    before_id = request.args.get('before_id', type=int)
+    limit = request.args.get('limit', app.config['MESSAGE_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['MESSAGE_PAGE_MAX']))
     
     conn = get_db_connection()
-    cursor = conn.execute('''
-        INSERT INTO messages (sender_id, receiver_id, chatroom_id, content, type)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (session['user_id'], receiver_id, chatroom_id, content, 'private'))
+    # 多取一条用于判断是否还有更早的消息
+    rows = fetch_conversation_messages(conn, chatroom_id, session['user_id'], peer_id, before_id, limit + 1)
+    conn.close()
     
-    message_id = cursor.lastrowid
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[1:]
     
-    # 获取发送者和接收者信息
-    sender = conn.execute('SELECT name FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    receiver = conn.execute('SELECT name FROM users WHERE id = ?', (receiver_id,)).fetchone()
+    return jsonify({
+        'success': True,
+        'messages': [dict(row) for row in rows],
+        'has_more': has_more,
+        'next_before_id': rows[0]['id'] if rows else None
+    })
+
+# API：把与某个用户的私聊标记为已读
+@app.route('/api/messages/<int:chatroom_id>/conversation/<int:peer_id>/read', methods=['POST'])
+def mark_conversation_read(chatroom_id, peer_id):
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': '未登录'}), 401
+    
+    limited = check_rate_limit('read_marker', session['user_id'])
+    if limited:
+        return json_response(*limited)
     
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE private_conversations SET unread = 0
+        WHERE user_id = ? AND chatroom_id = ? AND peer_id = ? AND unread > 0
+    ''', (session['user_id'], chatroom_id, peer_id))
     conn.commit()
     conn.close()
     
-    # 通过WebSocket发送给接收者
-    socketio.emit('new_private_message', {
+    return jsonify({'success': True})
+
+# 发送公共消息：校验、保存并广播，返回 (结果, HTTP状态码)。供REST接口和WebSocket事件共用
+def post_public_message(user_id, chatroom_id, content):
+    if not content or not chatroom_id:
+        return {'success': False, 'error': '缺少必要参数'}, 400
+    if not isinstance(content, str):
+        return {'success': False, 'error': '参数错误'}, 400
+    
+    sender = user_directory.get(user_id)
+    if not sender:
+        return {'success': False, 'error': '用户不存在'}, 401
+    
+    limited = check_rate_limit('message', user_id, chatroom_id)
+    if limited:
+        return limited
+    
+    message_id = save_message(user_id, None, chatroom_id, content, 'public')
+    
+    # 通过WebSocket广播消息
+    broadcaster.emit('new_message', {
         'id': message_id,
-        'sender_id': session['user_id'],
+        'sender_id': user_id,
         'sender_name': sender['name'],
-        'receiver_id': receiver_id,
-        'receiver_name': receiver['name'],
+        'sender_role': sender['role'],
         'content': content,
+        'type': 'public',
         'sent_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }, room=f'user_{receiver_id}')
+    }, room=f'chatroom_{chatroom_id}')
     
-    # 同时发送给发送者
-    socketio.emit('new_private_message', {
+    return {'success': True, 'message_id': message_id}, 200
+
+# 发送私人消息：校验、保存并发送给双方，返回 (结果, HTTP状态码)。供REST接口和WebSocket事件共用
+def post_private_message(user_id, chatroom_id, receiver_id, content):
+    if not content or not chatroom_id or not receiver_id:
+        return {'success': False, 'error': '缺少必要参数'}, 400
+    if not isinstance(content, str):
+        return {'success': False, 'error': '参数错误'}, 400
+    try:
+        chatroom_id, receiver_id = int(chatroom_id), int(receiver_id)
+    except (TypeError, ValueError):
+        return {'success': False, 'error': '参数错误'}, 400
+    
+    # 获取发送者和接收者信息
+    sender = user_directory.get(user_id)
+    receiver = user_directory.get(receiver_id)
+    if not sender:
+        return {'success': False, 'error': '用户不存在'}, 401
+    if not receiver:
+        return {'success': False, 'error': '接收者不存在'}, 404
+    
+    limited = check_rate_limit('private_message', user_id, chatroom_id)
+    if limited:
+        return limited
+    
+    message_id = save_message(user_id, receiver_id, chatroom_id, content, 'private')
+    
+    message = {
         'id': message_id,
-        'sender_id': session['user_id'],
+        'sender_id': user_id,
         'sender_name': sender['name'],
         'receiver_id': receiver_id,
         'receiver_name': receiver['name'],
         'content': content,
         'sent_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }, room=f'user_{session["user_id"]}')
+    }
     
-    return jsonify({'success': True})
+    # 通过WebSocket发送给接收者
+    socketio.emit('new_private_message', message, room=f'user_{receiver_id}')
+    
+    # 同时发送给发送者
+    socketio.emit('new_private_message', message, room=f'user_{user_id}')
+    
+    return {'success': True, 'message_id': message_id}, 200
+
+# API：发送公共消息
+@app.route('/api/message/public', methods=['POST'])
+def send_public_message():
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': '未登录'}), 401
+    
+    data = request.get_json()
+    result, status = post_public_message(session['user_id'], data.get('chatroom_id'), data.get('content'))
+    return json_response(result, status)
+
+# API：发送私人消息
+@app.route('/api/message/private', methods=['POST'])
+def send_private_message():
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': '未登录'}), 401
+    
+    data = request.get_json()
+    result, status = post_private_message(session['user_id'], data.get('chatroom_id'),
+                                          data.get('receiver_id'), data.get('content'))
+    return json_response(result, status)
 
 # API：创建题目
 @app.route('/api/question/create', methods=['POST'])
@@ -523,6 +1986,10 @@ def create_question():
     if question_type == 'choice' and (not options or not answer):
         return jsonify({'success': False, 'error': '选择题必须有选项和答案'}), 400
     
+    limited = check_rate_limit('publish', session['user_id'])
+    if limited:
+        return json_response(*limited)
+    
     conn = get_db_connection()
     
     # 将选项转换为JSON字符串
@@ -537,6 +2004,7 @@ def create_question():
     
     conn.commit()
     conn.close()
+    room_snapshots.invalidate(chatroom_id)
     
     # 通过WebSocket广播新题目
     socketio.emit('new_question', {
@@ -565,22 +2033,19 @@ def submit_answer():
     
     conn = get_db_connection()
     
-    # 检查是否已经回答过
-    existing_answer = conn.execute('''
-        SELECT * FROM answers WHERE question_id = ? AND user_id = ?
-    ''', (question_id, session['user_id'])).fetchone()
-    
-    if existing_answer:
-        conn.close()
-        return jsonify({'success': False, 'error': '已经回答过该题目'}), 400
-    
     # 获取题目信息
-    question = conn.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
+    question = conn.execute('SELECT id, chatroom_id, creator_id, type, answer FROM questions WHERE id = ?',
+                            (question_id,)).fetchone()
     
     if not question:
         conn.close()
         return jsonify({'success': False, 'error': '题目不存在'}), 404
     
+    limited = check_rate_limit('answer', session['user_id'], question['chatroom_id'])
+    if limited:
+        conn.close()
+        return json_response(*limited)
+    
     # 自动评分（仅选择题）
     score = None
     if question['type'] == 'choice' and question['answer']:
@@ -589,30 +2054,42 @@ def submit_answer():
         else:
             score = 0.0
     
+    # 由唯一索引判断是否已经回答过，重复点击或并发重试时不会插入第二条记录
     cursor = conn.execute('''
         INSERT INTO answers (question_id, user_id, content, score)
         VALUES (?, ?, ?, ?)
-    ''', (question_id, session['user_id'], content, score))
+        ON CONFLICT (question_id, user_id) DO NOTHING
+    ''', (question['id'], session['user_id'], content, score))
     
     answer_id = cursor.lastrowid
+    inserted = cursor.rowcount == 1
     
     conn.commit()
     conn.close()
     
-    # 通知教师有新答案（如果是教师创建的题目）
+    if not inserted:
+        return jsonify({'success': False, 'error': '已经回答过该题目'}), 400
+    
+    # 通知教师答题统计有更新（按推送间隔合并，不再逐条推送）
     if question['creator_id']:
-        socketio.emit('new_answer', {
-            'answer_id': answer_id,
-            'question_id': question_id,
-            'user_id': session['user_id'],
-            'user_name': session['user_name'],
-            'content': content,
-            'score': score,
-            'submitted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }, room=f'user_{question["creator_id"]}')
+        get_answer_stats().notify(question['id'], question['creator_id'])
     
     return jsonify({'success': True, 'answer_id': answer_id, 'score': score})
 
+# API：题目答题统计
+@app.route('/api/question/<int:question_id>/stats')
+def question_stats(question_id):
+    if not session.get('user_id') or session.get('user_role') != 'teacher':
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    stats = get_answer_stats().get(question_id)
+    if stats is None:
+        return jsonify({'success': False, 'error': '题目不存在'}), 404
+    if stats['creator_id'] != session['user_id']:
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    return jsonify({'success': True, 'stats': stats})
+
 # API：创建签到
 @app.route('/api/attendance/create', methods=['POST'])
 def create_attendance():
@@ -628,27 +2105,42 @@ def create_attendance():
     
     if not title or not attendance_type or not chatroom_id:
         return jsonify({'success': False, 'error': '缺少必要参数'}), 400
+    # 在写入数据库之前转换，否则非数字的参数会在签到已保存后才出错
+    try:
+        chatroom_id = int(chatroom_id)
+        expire_minutes = int(expire_minutes) if expire_minutes else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': '参数错误'}), 400
     
     # 密码签到必须有密码
     if attendance_type == 'password' and not password:
         return jsonify({'success': False, 'error': '密码签到必须设置密码'}), 400
     
+    limited = check_rate_limit('publish', session['user_id'])
+    if limited:
+        return json_response(*limited)
+    
     conn = get_db_connection()
     
-    # 计算过期时间
+    # 计算过期时间：数据库中按UTC保存，与 datetime('now') 比较；展示给用户时使用本地时间
     expire_at = None
     if expire_minutes:
-        expire_at = datetime.now().replace(microsecond=0) + pd.Timedelta(minutes=int(expire_minutes))
+        expire_at = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(minutes=expire_minutes)
+    expire_at_utc = expire_at.strftime('%Y-%m-%d %H:%M:%S') if expire_at else None
     
     cursor = conn.execute('''
         INSERT INTO attendance (chatroom_id, title, type, password, expire_at)
         VALUES (?, ?, ?, ?, ?)
-    ''', (chatroom_id, title, attendance_type, password, expire_at))
+    ''', (chatroom_id, title, attendance_type, password, expire_at_utc))
     
     attendance_id = cursor.lastrowid
     
     conn.commit()
     conn.close()
+    room_snapshots.invalidate(chatroom_id)
+    
+    # 登记到签到调度器，到截止时间自动关闭
+    get_attendance_scheduler().add(attendance_id, chatroom_id, attendance_type, password, expire_at_utc)
     
     # 通过WebSocket广播新签到
     socketio.emit('new_attendance', {
@@ -656,7 +2148,7 @@ def create_attendance():
         'title': title,
         'type': attendance_type,
         'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'expire_at': expire_at.strftime('%Y-%m-%d %H:%M:%S') if expire_at else None
+        'expire_at': expire_at.astimezone().strftime('%Y-%m-%d %H:%M:%S') if expire_at else None
     }, room=f'chatroom_{chatroom_id}')
     
     return jsonify({'success': True, 'attendance_id': attendance_id})
@@ -674,57 +2166,640 @@ def student_sign():
     if not attendance_id:
         return jsonify({'success': False, 'error': '缺少必要参数'}), 400
     
-    conn = get_db_connection()
-    
-    # 检查签到是否存在且未过期
-    attendance = conn.execute('''
-        SELECT * FROM attendance 
-        WHERE id = ? AND (expire_at IS NULL OR expire_at > datetime('now'))
-    ''', (attendance_id,)).fetchone()
+    # 检查签到是否存在且未过期（查询调度器中进行中的签到）
+    attendance = get_attendance_scheduler().lookup(attendance_id)
     
     if not attendance:
-        conn.close()
         return jsonify({'success': False, 'error': '签到不存在或已过期'}), 404
     
-    # 检查是否已经签到
-    existing_record = conn.execute('''
-        SELECT * FROM attendance_records WHERE attendance_id = ? AND user_id = ?
-    ''', (attendance_id, session['user_id'])).fetchone()
-    
-    if existing_record:
-        conn.close()
-        return jsonify({'success': False, 'error': '已经签到过'}), 400
+    limited = check_rate_limit('attendance_sign', session['user_id'], attendance['chatroom_id'])
+    if limited:
+        return json_response(*limited)
     
     # 检查密码（如果是密码签到）
     if attendance['type'] == 'password' and password != attendance['password']:
-        conn.close()
         return jsonify({'success': False, 'error': '签到密码错误'}), 400
     
+    conn = get_db_connection()
+    
+    # 由唯一索引判断是否已经签到，重复提交时不会插入第二条记录
     cursor = conn.execute('''
         INSERT INTO attendance_records (attendance_id, user_id)
         VALUES (?, ?)
-    ''', (attendance_id, session['user_id']))
+        ON CONFLICT (attendance_id, user_id) DO NOTHING
+    ''', (attendance['id'], session['user_id']))
     
     record_id = cursor.lastrowid
+    inserted = cursor.rowcount == 1
     
     conn.commit()
     conn.close()
     
+    if not inserted:
+        return jsonify({'success': False, 'error': '已经签到过'}), 400
+    
     # 通知教师有新签到
-    socketio.emit('new_attendance_record', {
+    broadcaster.emit('new_attendance_record', {
         'record_id': record_id,
         'attendance_id': attendance_id,
         'user_id': session['user_id'],
-        'user_name': session['user_name'],
+        'user_name': user_directory.name(session['user_id'], session['user_name']),
         'signed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }, room=f'chatroom_{attendance["chatroom_id"]}')
     
     return jsonify({'success': True, 'record_id': record_id})
 
-# WebSocket：加入聊天室
+# 聊天室学生名单（公共表表达式），签到汇总和导出共用
+ROOM_STUDENTS_CTE = '''
+    WITH students AS (
+        SELECT m.user_id, u.name FROM chatroom_members m
+        JOIN users u ON u.id = m.user_id
+        WHERE m.chatroom_id = ? AND u.role = 'student'
+    )
+'''
+
+# 签到汇总缓存：每个聊天室的汇总结果连同生成时的数据指纹一起缓存。
+# 指纹取签到、签到记录和成员表的最大ID，任一进程写入新记录后指纹变化，缓存随即失效。
+class AttendanceReports:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reports = {}
+    
+    @staticmethod
+    def _fingerprint(conn):
+        return tuple(conn.execute('''
+            SELECT (SELECT MAX(id) FROM attendance),
+                   (SELECT MAX(id) FROM attendance_records),
+                   (SELECT MAX(id) FROM chatroom_members)
+        ''').fetchone())
+    
+    @staticmethod
+    def _build(conn, chatroom_id):
+        attendances = conn.execute(ROOM_STUDENTS_CTE + '''
+            SELECT a.id, a.title, a.type, a.created_at, datetime(a.expire_at, 'localtime') AS expire_at,
+                   COUNT(s.user_id) AS present
+            FROM attendance a
+            LEFT JOIN attendance_records r ON r.attendance_id = a.id
+            LEFT JOIN students s ON s.user_id = r.user_id
+            WHERE a.chatroom_id = ?
+            GROUP BY a.id
+            ORDER BY a.id
+        ''', (chatroom_id, chatroom_id)).fetchall()
+        
+        # 反连接：聊天室成员中没有对应签到记录的学生
+        absent_rows = conn.execute(ROOM_STUDENTS_CTE + '''
+            SELECT a.id AS attendance_id, s.user_id, s.name
+            FROM attendance a CROSS JOIN students s
+            WHERE a.chatroom_id = ? AND NOT EXISTS (
+                SELECT 1 FROM attendance_records r WHERE r.attendance_id = a.id AND r.user_id = s.user_id
+            )
+            ORDER BY a.id, s.name
+        ''', (chatroom_id, chatroom_id)).fetchall()
+        
+        students = conn.execute(ROOM_STUDENTS_CTE + '''
+            SELECT s.user_id, s.name, COUNT(r.id) AS present
+            FROM students s
+            LEFT JOIN attendance_records r ON r.user_id = s.user_id
+                AND r.attendance_id IN (SELECT id FROM attendance WHERE chatroom_id = ?)
+            GROUP BY s.user_id
+            ORDER BY s.name
+        ''', (chatroom_id, chatroom_id)).fetchall()
+        
+        absent = {}
+        for row in absent_rows:
+            absent.setdefault(row['attendance_id'], []).append({'id': row['user_id'], 'name': row['name']})
+        
+        total = len(attendances)
+        return {
+            'chatroom_id': chatroom_id,
+            'student_count': len(students),
+            'attendances': [dict(row, absent=len(students) - row['present'],
+                                 absent_students=absent.get(row['id'], []))
+                            for row in attendances],
+            'students': [{'id': row['user_id'], 'name': row['name'], 'present': row['present'],
+                          'total': total, 'rate': round(row['present'] / total, 4) if total else None}
+                         for row in students]
+        }
+    
+    def get(self, chatroom_id):
+        conn = get_db_connection()
+        try:
+            fingerprint = self._fingerprint(conn)
+            with self._lock:
+                cached = self._reports.get(chatroom_id)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            
+            report = self._build(conn, chatroom_id)
+        finally:
+            conn.close()
+        
+        with self._lock:
+            self._reports[chatroom_id] = (fingerprint, report)
+        return report
+
+attendance_reports = AttendanceReports()
+
+# 辅助函数：逐行生成签到表（表头 + 每名学生一行），按学生顺序流式读取，不在内存中组装整张表
+def iter_attendance_sheet(chatroom_id):
+    conn = get_db_connection()
+    try:
+        attendances = conn.execute('''
+            SELECT id, title, created_at FROM attendance WHERE chatroom_id = ? ORDER BY id
+        ''', (chatroom_id,)).fetchall()
+        yield ['姓名'] + [f"{row['title']}（{row['created_at']}）" for row in attendances] + ['出勤次数', '出勤率']
+        
+        if not attendances:
+            return
+        
+        rows = conn.execute(ROOM_STUDENTS_CTE + '''
+            SELECT s.user_id, s.name, r.signed_at
+            FROM students s CROSS JOIN attendance a
+            LEFT JOIN attendance_records r ON r.attendance_id = a.id AND r.user_id = s.user_id
+            WHERE a.chatroom_id = ?
+            ORDER BY s.name, s.user_id, a.id
+        ''', (chatroom_id, chatroom_id))
+        
+        for (user_id, name), cells in itertools.groupby(rows, key=lambda row: (row['user_id'], row['name'])):
+            signed = [row['signed_at'] or '缺勤' for row in cells]
+            present = sum(1 for value in signed if value != '缺勤')
+            yield [name] + signed + [present, f'{present / len(attendances):.0%}']
+    finally:
+        conn.close()
+
+# 辅助函数：检查当前教师是否为聊天室的创建者
+def owns_chatroom(chatroom_id):
+    conn = get_db_connection()
+    chatroom = conn.execute('SELECT creator_id FROM chatrooms WHERE id = ?', (chatroom_id,)).fetchone()
+    conn.close()
+    return chatroom is not None and chatroom['creator_id'] == session.get('user_id')
+
+# API：签到汇总（每次签到的已签/未签名单，以及每名学生的出勤率）
+@app.route('/api/attendance/report/<int:chatroom_id>')
+def attendance_report(chatroom_id):
+    if not session.get('user_id') or session.get('user_role') != 'teacher':
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    if not owns_chatroom(chatroom_id):
+        return jsonify({'success': False, 'error': '聊天室不存在'}), 404
+    
+    return jsonify({'success': True, 'report': attendance_reports.get(chatroom_id)})
+
+# API：导出签到表（format=csv 或 xlsx）
+@app.route('/api/attendance/export/<int:chatroom_id>')
+def export_attendance(chatroom_id):
+    if not session.get('user_id') or session.get('user_role') != 'teacher':
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    if not owns_chatroom(chatroom_id):
+        return jsonify({'success': False, 'error': '聊天室不存在'}), 404
+    
+    export_format = request.args.get('format', 'csv')
+    filename = f'attendance_{chatroom_id}_{datetime.now():%Y%m%d}.{export_format}'
+    
+    if export_format == 'csv':
+        def generate():
+            # 带BOM，Excel打开时才能正确识别UTF-8中文
+            buffer = io.StringIO()
+            buffer.write('\ufeff')
+            writer = csv.writer(buffer)
+            for row in iter_attendance_sheet(chatroom_id):
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        return Response(generate(), mimetype='text/csv; charset=utf-8',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    
+    if export_format == 'xlsx':
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            return jsonify({'success': False, 'error': '导出Excel需要安装openpyxl（pip install openpyxl）'}), 500
+        
+        # 只写模式逐行写入临时文件，不在内存中保留整张工作表
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('签到表')
+        for row in iter_attendance_sheet(chatroom_id):
+            sheet.append(row)
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        
+        return send_file(output, as_attachment=True, download_name=filename,
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    
+    return jsonify({'success': False, 'error': '不支持的导出格式'}), 400
+
+# 位于反向代理之后：按代理添加的 X-Forwarded-For 等请求头还原客户端地址。
+# count 为代理层数，服务器进程只能由这些代理访问（如监听 127.0.0.1），否则客户端可以伪造请求头
+def trust_proxies(count):
+    app.config['TRUSTED_PROXIES'] = count
+    if count:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count, x_host=count)
+
+# 请求是否来自 METRICS_ALLOWED_ADDRS 中的地址。多进程部署时服务器进程位于反向代理之后，
+# 未配置可信代理时所有请求的来源地址都是代理本身（通常为127.0.0.1），此时不按地址放行
+def metrics_client_allowed():
+    if not app.config['TRUSTED_PROXIES'] and (os.environ.get('CLASSROOM_MESSAGE_QUEUE')
+                                              or 'X-Forwarded-For' in request.headers):
+        return False
+    return request.remote_addr in app.config['METRICS_ALLOWED_ADDRS']
+
+# 运行指标（Prometheus文本格式）
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics_client_allowed() and session.get('user_role') != 'teacher':
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# API：限流统计（当前令牌桶数量，以及各类操作按用户/聊天室被拒绝的次数）
+@app.route('/api/rate_limit/stats')
+def rate_limit_stats():
+    if not session.get('user_id') or session.get('user_role') != 'teacher':
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    return jsonify({'success': True, 'enabled': app.config['RATE_LIMIT_ENABLED'],
+                    'stats': rate_limiter.stats()})
+
+# API：聊天室广播合并统计（事件数、实际发送帧数、合并节省的帧数）
+@app.route('/api/broadcast/stats')
+def broadcast_stats():
+    if not session.get('user_id') or session.get('user_role') != 'teacher':
+        return jsonify({'success': False, 'error': '未授权'}), 403
+    
+    return jsonify({'success': True,
+                    'window_ms': app.config['BROADCAST_BATCH_WINDOW_MS'],
+                    'stats': broadcaster.stats()})
+
+# 在线状态登记：记录每个连接属于哪个用户、加入了哪些聊天室，以及每个聊天室中各在线用户的连接。
+# 同一用户可能同时打开多个页面，最后一个连接离开时才算下线。单进程部署时使用，只统计本进程的连接
+class PresenceRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sockets = {}   # 连接ID -> (用户ID, 已加入的聊天室集合)
+        self._rooms = {}     # 聊天室ID -> {用户ID: 连接ID集合}
+        self._names = {}     # 用户ID -> 姓名
+        self._dirty = {}     # 聊天室ID -> {用户ID: 本周期开始前是否在线}
+        self._push_scheduled = False
+    
+    def connect(self, sid, user_id, user_name):
+        with self._lock:
+            self._sockets[sid] = (user_id, set())
+            self._names[user_id] = user_name
+    
+    # quiet=True 用于被限流的进出：只更新本进程的连接记录，不写共享存储、不推送（见 _defer）
+    def join(self, sid, user_id, user_name, chatroom_id, quiet=False):
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None or entry[0] != user_id:
+                entry = self._sockets[sid] = (user_id, set())
+            self._names[user_id] = user_name
+            if chatroom_id in entry[1]:
+                return
+            entry[1].add(chatroom_id)
+            was_online = user_id in self._rooms.get(chatroom_id, ())
+            self._rooms.setdefault(chatroom_id, {}).setdefault(user_id, set()).add(sid)
+            if quiet:
+                self._defer(sid, user_id, chatroom_id)
+                return
+        # 共享存储的读写不持有锁，避免数据库慢时阻塞其他连接的进出
+        was_online = self._store_join(sid, user_id, user_name, chatroom_id, was_online)
+        with self._lock:
+            self._mark(chatroom_id, user_id, was_online)
+        self._schedule_push()
+    
+    def leave(self, sid, chatroom_id, quiet=False):
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None or chatroom_id not in entry[1]:
+                return
+            entry[1].discard(chatroom_id)
+            removed = self._remove(sid, entry[0], chatroom_id, quiet)
+        if removed:
+            self._store_leave(sid, chatroom_id)
+            self._schedule_push()
+    
+    def disconnect(self, sid):
+        with self._lock:
+            entry = self._sockets.pop(sid, None)
+            if entry is None:
+                return
+            user_id, rooms = entry
+            removed = [chatroom_id for chatroom_id in rooms if self._remove(sid, user_id, chatroom_id)]
+        for chatroom_id in removed:
+            self._store_leave(sid, chatroom_id)
+        if removed:
+            self._schedule_push()
+    
+    def _remove(self, sid, user_id, chatroom_id, quiet=False):
+        """从本地记录中移除连接（调用时已持有锁），返回是否需要写共享存储并推送"""
+        users = self._rooms.get(chatroom_id, {})
+        sids = users.get(user_id)
+        if sids is None:
+            return False
+        sids.discard(sid)
+        if not sids:
+            del users[user_id]
+            if not users:
+                del self._rooms[chatroom_id]
+        if quiet:
+            self._defer(sid, user_id, chatroom_id)
+            return False
+        self._mark(chatroom_id, user_id, True)
+        return True
+    
+    # 以下方法由 SharedPresenceRegistry 改为读写数据库。_defer 在持有锁时调用，_store_* 调用时不持有锁
+    def _defer(self, sid, user_id, chatroom_id):
+        # 单进程时在线名单直接来自本进程的连接记录，被限流的变化只是不推送
+        pass
+    
+    def _store_join(self, sid, user_id, user_name, chatroom_id, was_online):
+        """登记连接，返回登记前该用户是否已在线"""
+        return was_online
+    
+    def _store_leave(self, sid, chatroom_id):
+        pass
+    
+    def _mark(self, chatroom_id, user_id, was_online):
+        # 只记录本周期内第一次变化前的状态，推送时与当前状态比较，进出抵消的不推送
+        self._dirty.setdefault(chatroom_id, {}).setdefault(user_id, was_online)
+    
+    def _schedule_push(self):
+        with self._lock:
+            if self._push_scheduled or not self._dirty:
+                return
+            self._push_scheduled = True
+        socketio.start_background_task(self._push_later)
+    
+    def _push_later(self):
+        socketio.sleep(app.config['PRESENCE_BROADCAST_INTERVAL_MS'] / 1000)
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._push_scheduled = False
+            names = dict(self._names)
+        
+        for chatroom_id, changes in dirty.items():
+            online = {user['user_id'] for user in self.online(chatroom_id)}
+            joined = [user_id for user_id, was_online in changes.items() if not was_online and user_id in online]
+            left = [user_id for user_id, was_online in changes.items() if was_online and user_id not in online]
+            if joined or left:
+                socketio.emit('presence', {
+                    'chatroom_id': chatroom_id,
+                    'online_count': len(online),
+                    'joined': [{'user_id': user_id, 'user_name': names.get(user_id)} for user_id in joined],
+                    'left': [{'user_id': user_id, 'user_name': names.get(user_id)} for user_id in left],
+                }, room=f'chatroom_{chatroom_id}')
+    
+    def count(self, chatroom_id):
+        with self._lock:
+            return len(self._rooms.get(chatroom_id, ()))
+    
+    def online(self, chatroom_id):
+        with self._lock:
+            user_ids = list(self._rooms.get(chatroom_id, ()))
+            return [{'user_id': user_id, 'user_name': self._names.get(user_id)} for user_id in user_ids]
+    
+    def room_counts(self):
+        with self._lock:
+            return {chatroom_id: len(users) for chatroom_id, users in self._rooms.items()}
+
+# 多进程部署时的在线状态：各进程仍在本地记录自己的连接（用于处理断开），同时登记到共享的数据库中，
+# 在线人数和名单按所有进程的连接统计，每个进程广播的都是全局数据。
+# 进程异常退出时来不及删除自己的登记，由其他进程在其心跳过期后清除并推送下线
+class SharedPresenceRegistry(PresenceRegistry):
+    ONLINE_SQL = '''
+        SELECT pc.user_id, MAX(pc.user_name) AS user_name FROM presence_connections pc
+        JOIN presence_workers w ON pc.worker_id = w.worker_id
+        WHERE pc.chatroom_id = ? AND w.heartbeat_at > ?
+        GROUP BY pc.user_id
+    '''
+    
+    def __init__(self):
+        super().__init__()
+        self.worker_id = secrets.token_hex(8)
+        self._heartbeat_task = None
+        self._pending = {}   # 被限流、尚未写入数据库的 (连接ID, 聊天室ID) -> 用户ID
+    
+    def _alive_since(self):
+        return time.time() - 3 * app.config['PRESENCE_HEARTBEAT_S']
+    
+    def _ensure_heartbeat(self, conn):
+        # 第一次登记连接时写入心跳并启动定期更新
+        with self._lock:
+            if self._heartbeat_task is not None:
+                return
+            self._heartbeat_task = socketio.start_background_task(self._run_heartbeat)
+        self._beat(conn)
+    
+    def _beat(self, conn):
+        conn.execute('''
+            INSERT INTO presence_workers (worker_id, heartbeat_at) VALUES (?, ?)
+            ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+        ''', (self.worker_id, time.time()))
+        conn.commit()
+    
+    def _was_online(self, chatroom_id, user_id):
+        conn = get_db_connection()
+        row = conn.execute('''
+            SELECT 1 FROM presence_connections pc
+            JOIN presence_workers w ON pc.worker_id = w.worker_id
+            WHERE pc.chatroom_id = ? AND pc.user_id = ? AND w.heartbeat_at > ?
+            LIMIT 1
+        ''', (chatroom_id, user_id, self._alive_since())).fetchone()
+        conn.close()
+        return row is not None
+    
+    def _store_join(self, sid, user_id, user_name, chatroom_id, was_online):
+        # 是否已在线以所有进程的登记为准，本进程的记录只用于处理断开
+        was_online = self._was_online(chatroom_id, user_id)
+        conn = get_db_connection()
+        self._ensure_heartbeat(conn)
+        conn.execute('''
+            INSERT OR REPLACE INTO presence_connections (worker_id, sid, chatroom_id, user_id, user_name)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (self.worker_id, sid, chatroom_id, user_id, user_name))
+        conn.commit()
+        # 写入期间连接可能已经离开或断开，对方的删除可能先于本次写入执行，这里补删
+        with self._lock:
+            entry = self._sockets.get(sid)
+            gone = entry is None or chatroom_id not in entry[1]
+        if gone:
+            conn.execute('DELETE FROM presence_connections WHERE worker_id = ? AND sid = ? AND chatroom_id = ?',
+                         (self.worker_id, sid, chatroom_id))
+            conn.commit()
+        conn.close()
+        return was_online
+    
+    def _store_leave(self, sid, chatroom_id):
+        conn = get_db_connection()
+        conn.execute('DELETE FROM presence_connections WHERE worker_id = ? AND sid = ? AND chatroom_id = ?',
+                     (self.worker_id, sid, chatroom_id))
+        conn.commit()
+        conn.close()
+    
+    def _defer(self, sid, user_id, chatroom_id):
+        # 被限流的进出先只记在本进程，下次心跳时按连接的最新状态写入一次，频繁进出也不会频繁写库
+        self._pending[(sid, chatroom_id)] = user_id
+    
+    def _flush_pending(self, conn):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            states = []
+            for (sid, chatroom_id), user_id in pending.items():
+                entry = self._sockets.get(sid)
+                joined = entry is not None and chatroom_id in entry[1]
+                states.append((sid, chatroom_id, joined, user_id, self._names.get(user_id)))
+        changed = []
+        for sid, chatroom_id, joined, user_id, user_name in states:
+            changed.append((chatroom_id, user_id, self._was_online(chatroom_id, user_id)))
+            if joined:
+                conn.execute('''
+                    INSERT OR REPLACE INTO presence_connections (worker_id, sid, chatroom_id, user_id, user_name)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.worker_id, sid, chatroom_id, user_id, user_name))
+            else:
+                conn.execute('DELETE FROM presence_connections WHERE worker_id = ? AND sid = ? AND chatroom_id = ?',
+                             (self.worker_id, sid, chatroom_id))
+        conn.commit()
+        return changed
+    
+    def _run_heartbeat(self):
+        while True:
+            socketio.sleep(app.config['PRESENCE_HEARTBEAT_S'])
+            try:
+                conn = get_db_connection()
+                self._beat(conn)
+                changed = self._flush_pending(conn)
+                expired = self._expire_workers(conn)
+                conn.close()
+            except sqlite3.Error as e:
+                app.logger.warning(f'更新在线状态心跳失败: {e}')
+                continue
+            if changed or expired:
+                with self._lock:
+                    for chatroom_id, user_id, was_online in changed:
+                        self._mark(chatroom_id, user_id, was_online)
+                    for chatroom_id, user_id, user_name in expired:
+                        self._names.setdefault(user_id, user_name)
+                        self._mark(chatroom_id, user_id, True)
+                self._schedule_push()
+    
+    def _expire_workers(self, conn):
+        """清除心跳过期的进程登记的连接，返回被清除的 (聊天室ID, 用户ID, 姓名)"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            dead = 'SELECT worker_id FROM presence_workers WHERE heartbeat_at <= ?'
+            since = self._alive_since()
+            rows = conn.execute(f'''
+                SELECT DISTINCT chatroom_id, user_id, user_name FROM presence_connections
+                WHERE worker_id IN ({dead})
+            ''', (since,)).fetchall()
+            conn.execute(f'DELETE FROM presence_connections WHERE worker_id IN ({dead})', (since,))
+            conn.execute('DELETE FROM presence_workers WHERE heartbeat_at <= ?', (since,))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return [tuple(row) for row in rows]
+    
+    def shutdown(self):
+        """进程正常退出时删除本进程的登记"""
+        if self._heartbeat_task is None:
+            return
+        try:
+            conn = get_db_connection()
+            conn.execute('DELETE FROM presence_connections WHERE worker_id = ?', (self.worker_id,))
+            conn.execute('DELETE FROM presence_workers WHERE worker_id = ?', (self.worker_id,))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error:
+            pass
+    
+    # 多进程时人数需要按所有进程的登记统计，是一次走 (chatroom_id, user_id) 索引的查询，不像单进程那样直接取本地计数
+    def count(self, chatroom_id):
+        conn = get_db_connection()
+        row = conn.execute(f'SELECT COUNT(*) FROM ({self.ONLINE_SQL})',
+                           (chatroom_id, self._alive_since())).fetchone()
+        conn.close()
+        return row[0]
+    
+    def online(self, chatroom_id):
+        conn = get_db_connection()
+        rows = conn.execute(self.ONLINE_SQL, (chatroom_id, self._alive_since())).fetchall()
+        conn.close()
+        return [{'user_id': row['user_id'], 'user_name': row['user_name']} for row in rows]
+    
+    def room_counts(self):
+        conn = get_db_connection()
+        rows = conn.execute('''
+            SELECT pc.chatroom_id, COUNT(DISTINCT pc.user_id) FROM presence_connections pc
+            JOIN presence_workers w ON pc.worker_id = w.worker_id
+            WHERE w.heartbeat_at > ?
+            GROUP BY pc.chatroom_id
+        ''', (self._alive_since(),)).fetchall()
+        conn.close()
+        return {chatroom_id: count for chatroom_id, count in rows}
+
+# 配置了广播通道（多进程部署）时在线状态保存在共享的数据库中，否则只在本进程内存中统计
+if os.environ.get('CLASSROOM_MESSAGE_QUEUE'):
+    presence = SharedPresenceRegistry()
+    atexit.register(presence.shutdown)
+else:
+    presence = PresenceRegistry()
+
+# API：聊天室当前在线人数和名单（users=0 时只返回人数）
+@app.route('/api/chatroom/<int:chatroom_id>/online')
+def chatroom_online(chatroom_id):
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': '未登录'}), 401
+    
+    if request.args.get('users') == '0':
+        return jsonify({'success': True, 'count': presence.count(chatroom_id)})
+    users = presence.online(chatroom_id)
+    return jsonify({'success': True, 'count': len(users), 'users': users})
+
+# 当前WebSocket连接数
+_socket_connections = 0
+_socket_connections_lock = threading.Lock()
+
+# WebSocket：建立连接（超过连接数上限时拒绝）
+@socketio.on('connect')
+def on_connect():
+    global _socket_connections
+    limit = app.config['MAX_SOCKET_CONNECTIONS']
+    with _socket_connections_lock:
+        if limit and _socket_connections >= limit:
+            return False
+        _socket_connections += 1
+    
+    if session.get('user_id'):
+        presence.connect(request.sid, session['user_id'], session.get('user_name'))
+    
+    # 确保签到调度器已启动，服务重启后尚未截止的签到也能按时关闭
+    get_attendance_scheduler()
+
+# WebSocket：断开连接
+@socketio.on('disconnect')
+def on_disconnect(reason=None):
+    global _socket_connections
+    with _socket_connections_lock:
+        _socket_connections = max(0, _socket_connections - 1)
+    
+    # 直接关闭页面或断网时不会收到 leave，在这里把该连接从所有聊天室中移除
+    presence.disconnect(request.sid)
+
+# WebSocket：加入聊天室（断线重连时携带 last_seen，通过回执返回期间错过的数据）
 @socketio.on('join')
 def on_join(data):
-    chatroom_id = data.get('chatroom_id')
+    if not isinstance(data, dict):
+        return
+    try:
+        chatroom_id = int(data.get('chatroom_id'))
+    except (TypeError, ValueError):
+        return
     
     if not chatroom_id or not session.get('user_id'):
         return
@@ -735,17 +2810,23 @@ def on_join(data):
     # 加入用户私人房间
     join_room(f'user_{session["user_id"]}')
     
-    # 通知其他人
-    emit('user_joined', {
-        'user_id': session['user_id'],
-        'user_name': session['user_name'],
-        'joined_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }, room=f'chatroom_{chatroom_id}', include_self=False)
+    # 登记在线状态，进出提示合并后统一推送给聊天室（频繁断线重连时仍加入房间，但不写共享存储、不推送）
+    quiet = check_rate_limit('presence', session['user_id']) is not None
+    presence.join(request.sid, session['user_id'], session['user_name'], chatroom_id, quiet=quiet)
+    
+    last_seen = data.get('last_seen')
+    if isinstance(last_seen, dict):
+        return fetch_sync_delta(chatroom_id, session['user_id'], last_seen)
 
 # WebSocket：离开聊天室
 @socketio.on('leave')
 def on_leave(data):
-    chatroom_id = data.get('chatroom_id')
+    if not isinstance(data, dict):
+        return
+    try:
+        chatroom_id = int(data.get('chatroom_id'))
+    except (TypeError, ValueError):
+        return
     
     if not chatroom_id or not session.get('user_id'):
         return
@@ -753,12 +2834,32 @@ def on_leave(data):
     # 离开聊天室房间
     leave_room(f'chatroom_{chatroom_id}')
     
-    # 通知其他人
-    emit('user_left', {
-        'user_id': session['user_id'],
-        'user_name': session['user_name'],
-        'left_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }, room=f'chatroom_{chatroom_id}')
+    # 更新在线状态
+    quiet = check_rate_limit('presence', session['user_id']) is not None
+    presence.leave(request.sid, chatroom_id, quiet=quiet)
+
+# WebSocket：发送公共消息（通过已建立的连接发送，省去HTTP请求开销；返回值作为确认回执）
+@socketio.on('send_message')
+def on_send_message(data):
+    if not session.get('user_id'):
+        return {'success': False, 'error': '未登录'}
+    
+    if not isinstance(data, dict):
+        return {'success': False, 'error': '参数错误'}
+    result, _ = post_public_message(session['user_id'], data.get('chatroom_id'), data.get('content'))
+    return result
+
+# WebSocket：发送私人消息
+@socketio.on('send_private_message')
+def on_send_private_message(data):
+    if not session.get('user_id'):
+        return {'success': False, 'error': '未登录'}
+    
+    if not isinstance(data, dict):
+        return {'success': False, 'error': '参数错误'}
+    result, _ = post_private_message(session['user_id'], data.get('chatroom_id'),
+                                     data.get('receiver_id'), data.get('content'))
+    return result
 
 # 路由：退出登录
 @app.route('/logout')
@@ -768,4 +2869,6 @@ def logout():
 
 # 启动应用
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+    # 直接运行本文件仅用于开发调试，上课请使用 app_launcher.py 启动
+    init_db()
+    socketio.run(app, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
@@ -1,13 +1,70 @@
 import os
 import sys
+import argparse
+
+def parse_args(argv=None):
+    """解析命令行参数（各项也可通过环境变量设置）"""
+    parser = argparse.ArgumentParser(description='课堂互动系统启动器')
+    parser.add_argument('--async-mode', choices=['auto', 'eventlet', 'gevent', 'threading'],
+                        default=os.environ.get('CLASSROOM_ASYNC_MODE', 'auto'),
+                        help='服务器异步模式，auto 表示依次尝试 eventlet、gevent，都未安装时使用 threading')
+    parser.add_argument('--host', default=os.environ.get('CLASSROOM_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('CLASSROOM_PORT', 5000)))
+    parser.add_argument('--max-workers', type=int, default=int(os.environ.get('CLASSROOM_MAX_WORKERS', 1000)),
+                        help='eventlet/gevent 模式下同时处理的最大连接（协程）数')
+    parser.add_argument('--max-connections', type=int,
+                        default=int(os.environ.get('CLASSROOM_MAX_CONNECTIONS', 0)),
+                        help='允许的最大WebSocket连接数，0 表示不限制')
+    parser.add_argument('--message-queue', default=os.environ.get('CLASSROOM_MESSAGE_QUEUE', ''),
+                        help='多进程部署时的广播通道，例如 redis://localhost:6379/0 或 tcp://127.0.0.1:6001')
+    parser.add_argument('--metrics-interval', type=int,
+                        default=int(os.environ.get('CLASSROOM_METRICS_INTERVAL', 0)),
+                        help='每隔多少秒把运行指标追加写入日志目录，0 表示不写入（仍可通过 /metrics 查看）')
+    parser.add_argument('--trusted-proxies', type=int,
+                        default=int(os.environ.get('CLASSROOM_TRUSTED_PROXIES', 0)),
+                        help='位于几层反向代理之后（按 X-Forwarded-For 取客户端地址），0 表示直接对外提供服务')
+    parser.add_argument('--log-dir', default=os.environ.get('CLASSROOM_LOG_DIR', ''),
+                        help='日志和运行指标的写入目录，默认为项目根目录下的 logs')
+    parser.add_argument('--no-browser', action='store_true', help='启动后不自动打开浏览器')
+    return parser.parse_args(argv)
+
+def select_async_mode(requested):
+    """返回实际可用的异步模式"""
+    candidates = ['eventlet', 'gevent'] if requested == 'auto' else [requested]
+    for mode in candidates:
+        if mode == 'threading':
+            return mode
+        try:
+            __import__(mode)
+            return mode
+        except ImportError:
+            continue
+    return 'threading'
+
+# 猴子补丁必须在导入 socket、threading 等标准库模块之前完成，因此放在文件最前面
+ARGS = parse_args() if __name__ == '__main__' else parse_args([])
+ASYNC_MODE = select_async_mode(ARGS.async_mode)
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+# app.py 按这些环境变量创建 SocketIO，避免自动选用未打补丁的异步库
+os.environ['CLASSROOM_ASYNC_MODE'] = ASYNC_MODE
+if ARGS.message_queue:
+    os.environ['CLASSROOM_MESSAGE_QUEUE'] = ARGS.message_queue
+
 import socket
 import subprocess
+import threading
+import time
 import webbrowser
 import logging
 from datetime import datetime
 
 # 设置日志
-log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
+log_dir = ARGS.log_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
 os.makedirs(log_dir, exist_ok=True)
 log_file = os.path.join(log_dir, f'classroom_system_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
 
@@ -35,7 +92,7 @@ def get_local_ip():
         logger.error(f"获取本机IP失败: {e}")
         return "127.0.0.1"  # 如果获取失败，返回本地回环地址
 
-def configure_firewall():
+def configure_firewall(port=5000):
     """配置Windows防火墙，允许Flask应用通过"""
     if sys.platform != 'win32':
         logger.info("非Windows系统，跳过防火墙配置")
@@ -44,7 +101,7 @@ def configure_firewall():
     try:
         # 添加防火墙规则允许Flask应用（端口5000）
         rule_name = "ClassroomChatSystem"
-        cmd = f'netsh advfirewall firewall add rule name="{rule_name}" dir=in action=allow protocol=TCP localport=5000'
+        cmd = f'netsh advfirewall firewall add rule name="{rule_name}" dir=in action=allow protocol=TCP localport={port}'
         
         # 在Windows上使用管理员权限运行命令
         if sys.platform == 'win32':
@@ -60,10 +117,23 @@ def configure_firewall():
         logger.error(f"配置防火墙失败: {e}")
         print(f"配置防火墙时出错: {e}")
 
+def open_browser_when_ready(port, timeout=30):
+    """等服务器开始监听后再打开浏览器，避免浏览器先于服务器启动而显示无法访问"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                break
+        except OSError:
+            time.sleep(0.1)
+    webbrowser.open(f"http://localhost:{port}")
+
 def main():
     """主函数，启动Flask应用并显示访问信息"""
-    # 配置防火墙
-    configure_firewall()
+    started = time.perf_counter()
+    
+    # 配置防火墙（调用 netsh 较慢，与加载应用同时进行）
+    threading.Thread(target=configure_firewall, args=(ARGS.port,), daemon=True).start()
     
     # 获取本机IP
     local_ip = get_local_ip()
@@ -74,27 +144,52 @@ def main():
     os.makedirs(data_dir, exist_ok=True)
     os.makedirs(uploads_dir, exist_ok=True)
     
+    port = ARGS.port
+    
     # 显示访问信息
     print("\n" + "="*50)
     print("课堂互动系统启动中...")
     print("="*50)
-    print(f"本机访问地址: http://localhost:5000")
-    print(f"局域网访问地址: http://{local_ip}:5000")
+    print(f"本机访问地址: http://localhost:{port}")
+    print(f"局域网访问地址: http://{local_ip}:{port}")
     print("其他设备可通过浏览器访问上述局域网地址")
+    print(f"服务器模式: {ASYNC_MODE}")
+    if ARGS.message_queue:
+        print(f"广播通道: {ARGS.message_queue}")
     print("="*50 + "\n")
     
     # 记录启动信息
-    logger.info(f"系统启动 - 本地地址: http://localhost:5000, 局域网地址: http://{local_ip}:5000")
-    
-    # 自动打开浏览器
-    webbrowser.open(f"http://localhost:5000")
+    logger.info(f"系统启动 - 本地地址: http://localhost:{port}, 局域网地址: http://{local_ip}:{port}, 服务器模式: {ASYNC_MODE}")
+    if ARGS.async_mode != 'auto' and ASYNC_MODE != ARGS.async_mode:
+        logger.warning(f"未安装 {ARGS.async_mode}，已回退到 {ASYNC_MODE} 模式")
     
     # 启动Flask应用
     try:
-        # 导入app模块
-        from app import app
-        # 启动Flask应用
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        # 导入app模块，并在开始监听前创建或升级数据库结构
+        from app import app, socketio, init_db, start_metrics_dump, trust_proxies
+        init_db()
+        logger.info(f"应用加载完成，耗时 {time.perf_counter() - started:.2f}s")
+        app.config['MAX_SOCKET_CONNECTIONS'] = ARGS.max_connections
+        trust_proxies(ARGS.trusted_proxies)
+        if ARGS.metrics_interval > 0:
+            start_metrics_dump(log_dir, ARGS.metrics_interval)
+        
+        # 按异步模式设置并发上限
+        run_options = {}
+        if ASYNC_MODE == 'eventlet':
+            run_options['max_size'] = ARGS.max_workers
+        elif ASYNC_MODE == 'gevent':
+            run_options['spawn'] = ARGS.max_workers
+        else:
+            # threading 模式只用于未安装 eventlet/gevent 时的兜底
+            run_options['allow_unsafe_werkzeug'] = True
+        
+        # 自动打开浏览器
+        if not ARGS.no_browser:
+            threading.Thread(target=open_browser_when_ready, args=(port,), daemon=True).start()
+        
+        # 启动服务器（同时处理HTTP和WebSocket）
+        socketio.run(app, host=ARGS.host, port=port, debug=False, **run_options)
     except Exception as e:
         logger.error(f"启动Flask应用失败: {e}")
         print(f"错误: 启动应用失败 - {e}")
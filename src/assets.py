@@ -0,0 +1,123 @@
+"""静态资源
+
+首次使用时扫描 static 目录，为每个文件按内容计算哈希，生成带哈希的文件名（如 jquery.min.1a2b3c4d5e.js），
+并预先生成 gzip 压缩版本（安装了 brotli 时还有 br 版本），之后每次请求直接返回，不再重复压缩。
+带哈希的地址内容永远不变，浏览器可以长期缓存；文件更新并重启服务后哈希随之改变，页面自动引用新地址。
+CSS 中以相对路径引用的字体等文件同样替换为带哈希的地址。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:
+    # 可选依赖：未安装时只提供 gzip 版本
+    brotli = None
+
+# 值得压缩的类型；字体、图片本身已经压缩过
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+_CSS_URL = re.compile(r'''url\((["']?)([^"')]+)\1\)''')
+
+
+def hashed_name(path, digest):
+    """在扩展名前插入哈希：css/style.css -> css/style.<digest>.css"""
+    root, ext = posixpath.splitext(path)
+    return f'{root}.{digest}{ext}'
+
+
+class Asset:
+    """一个静态文件：原始内容、各压缩版本和对应的ETag"""
+
+    def __init__(self, path, content):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(content).hexdigest()[:10]
+        self.hashed_path = hashed_name(path, self.digest)
+        self.encodings = {'identity': content}
+        if self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            self.encodings['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(content, quality=11)
+
+    def choose_encoding(self, accept_encodings):
+        """按浏览器的 Accept-Encoding 选择体积最小的版本"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+    def etag(self, encoding):
+        return self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+
+
+class StaticAssets:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._assets = None
+        self._hashed = None
+
+    def _load(self):
+        paths = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                paths.append(os.path.relpath(full_path, self.root).replace(os.sep, '/'))
+
+        # 先处理其他文件，CSS 放在最后，以便把其中引用的文件替换为带哈希的地址
+        assets = {}
+        for path in sorted(paths, key=lambda p: (p.endswith('.css'), p)):
+            with open(os.path.join(self.root, path), 'rb') as f:
+                content = f.read()
+            if path.endswith('.css'):
+                content = self._rewrite_css(path, content, assets)
+            assets[path] = Asset(path, content)
+
+        self._hashed = {asset.hashed_path: asset for asset in assets.values()}
+        self._assets = assets
+
+    @staticmethod
+    def _rewrite_css(path, content, assets):
+        base = posixpath.dirname(path)
+
+        def replace(match):
+            quote, url = match.groups()
+            if url.startswith(('/', 'data:', 'http:', 'https:', '#')):
+                return match.group(0)
+            target, _, _ = url.partition('?')
+            target, _, fragment = target.partition('#')
+            asset = assets.get(posixpath.normpath(posixpath.join(base, target)))
+            if asset is None:
+                return match.group(0)
+            new_url = posixpath.relpath(asset.hashed_path, base or '.')
+            if fragment:
+                new_url += '#' + fragment
+            return f'url({quote}{new_url}{quote})'
+
+        return _CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+    def _ensure_loaded(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self._load()
+
+    def url_path(self, path):
+        """模板中引用的地址：返回带哈希的路径，找不到文件时原样返回"""
+        self._ensure_loaded()
+        asset = self._assets.get(path)
+        return asset.hashed_path if asset else path
+
+    def find(self, path):
+        """按请求路径查找文件，返回 (Asset, 是否为带哈希的地址)；找不到时返回 (None, False)"""
+        self._ensure_loaded()
+        asset = self._hashed.get(path)
+        if asset is not None:
+            return asset, True
+        return self._assets.get(path), False
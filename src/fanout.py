@@ -0,0 +1,211 @@
+"""多进程广播通道
+
+多个服务器进程同时运行时，某个进程发出的 socketio.emit 需要送达连接在其他进程上的客户端。
+Flask-SocketIO 通过 client_manager（消息队列）实现这一点，本模块根据 CLASSROOM_MESSAGE_QUEUE
+的地址选择实现：
+
+- redis://、rediss://、kafka://、zmq+tcp:// 等：交给 Flask-SocketIO 自带的消息队列（需安装对应依赖）
+- tcp://主机:端口：连接本模块提供的轻量转发服务（python fanout.py --port 6001），无需安装Redis
+- memory://：同一进程内多个 SocketIO 实例之间转发，仅用于测试
+"""
+import argparse
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+import socketio
+
+_HEADER = struct.Struct('!I')
+
+
+def _send_frame(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    buffer = b''
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError('连接已关闭')
+        buffer += chunk
+    return buffer
+
+
+def _recv_frame(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _recv_exact(sock, size)
+
+
+class MemoryManager(socketio.PubSubManager):
+    """进程内广播通道：同一进程中使用相同频道的实例互相转发"""
+    name = 'memory'
+    _subscribers = {}
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, url='memory://', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with self._subscribers_lock:
+                self._subscribers.setdefault(channel, []).append(self._inbox)
+
+    def _publish(self, data):
+        payload = self.json.dumps(data)
+        with self._subscribers_lock:
+            inboxes = list(self._subscribers.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(payload)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+class TcpManager(socketio.PubSubManager):
+    """连接 fanout.py 转发服务的广播通道
+
+    发布和接收使用两条独立的连接：发布连接只写不读（握手时声明不订阅），接收连接由监听线程独占，
+    任何一方出错时只关闭并重建自己的连接，不会影响另一方。
+    """
+    name = 'tcp'
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or '127.0.0.1', parsed.port or 6001)
+        self._publish_sock = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self, subscribe):
+        sock = socket.create_connection(self.address)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # 握手：告知转发服务本连接是否需要接收消息
+            _send_frame(sock, json.dumps({'channel': self.channel, 'subscribe': subscribe}).encode('utf-8'))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _publish(self, data):
+        payload = self.json.dumps(data).encode('utf-8')
+        for retries_left in (1, 0):
+            with self._publish_lock:
+                try:
+                    if self._publish_sock is None:
+                        self._publish_sock = self._connect(subscribe=False)
+                    _send_frame(self._publish_sock, payload)
+                    return
+                except OSError as exc:
+                    if self._publish_sock is not None:
+                        self._publish_sock.close()
+                        self._publish_sock = None
+                    self._get_logger().error(f'广播消息发送失败{"，重试中" if retries_left else ""}: {exc}')
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            sock = None
+            try:
+                sock = self._connect(subscribe=True)
+                retry_sleep = 1
+                while True:
+                    yield _recv_frame(sock).decode('utf-8')
+            except OSError as exc:
+                self._get_logger().error(f'广播通道连接断开，{retry_sleep}秒后重连: {exc}')
+            finally:
+                if sock is not None:
+                    sock.close()
+            time.sleep(retry_sleep)
+            retry_sleep = min(retry_sleep * 2, 30)
+
+
+def socketio_queue_options(url):
+    """根据消息队列地址返回创建 SocketIO 时需要的参数，未配置时返回空字典"""
+    if not url:
+        return {}
+    if url.startswith('memory://'):
+        return {'client_manager': MemoryManager(url)}
+    if url.startswith('tcp://'):
+        return {'client_manager': TcpManager(url)}
+    return {'message_queue': url}
+
+
+def run_broker(host='127.0.0.1', port=6001):
+    """运行转发服务：把任一进程发布的消息转发给同一频道上的所有订阅进程"""
+    subscribers = {}
+    dropped = {}   # 每个订阅者因发送队列已满而丢弃的消息数
+    lock = threading.Lock()
+
+    def writer(sock, outbox):
+        try:
+            while True:
+                payload = outbox.get()
+                if payload is None:
+                    return
+                _send_frame(sock, payload)
+        except OSError:
+            # 关闭连接，使 handle 中的读取随之结束并取消订阅
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle(sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        outbox = None
+        try:
+            hello = json.loads(_recv_frame(sock).decode('utf-8'))
+            channel = hello.get('channel', 'flask-socketio')
+            if hello.get('subscribe'):
+                # 每个订阅者单独的发送队列，慢的订阅者不会拖慢其他进程
+                outbox = queue.Queue(maxsize=10000)
+                threading.Thread(target=writer, args=(sock, outbox), daemon=True).start()
+                with lock:
+                    subscribers.setdefault(channel, []).append(outbox)
+            while True:
+                payload = _recv_frame(sock)
+                with lock:
+                    outboxes = list(subscribers.get(channel, []))
+                for target in outboxes:
+                    try:
+                        target.put_nowait(payload)
+                    except queue.Full:
+                        with lock:
+                            dropped[target] = count = dropped.get(target, 0) + 1
+                        if count == 1 or count % 1000 == 0:
+                            print(f'订阅者接收过慢，发送队列已满，已丢弃 {count} 条广播（频道 {channel}）')
+        except (OSError, ValueError):
+            pass
+        finally:
+            if outbox is not None:
+                with lock:
+                    for outboxes in subscribers.values():
+                        if outbox in outboxes:
+                            outboxes.remove(outbox)
+                    dropped.pop(outbox, None)
+                # 通知发送线程退出；队列已满时发送线程仍阻塞在已关闭的连接上，出错后自行结束
+                try:
+                    outbox.put_nowait(None)
+                except queue.Full:
+                    pass
+            sock.close()
+
+    server = socket.create_server((host, port), reuse_port=False)
+    print(f'广播转发服务已启动: tcp://{host}:{port}')
+    while True:
+        sock, _ = server.accept()
+        threading.Thread(target=handle, args=(sock,), daemon=True).start()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='课堂互动系统多进程广播转发服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6001)
+    args = parser.parse_args()
+    run_broker(args.host, args.port)
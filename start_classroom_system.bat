@@ -65,6 +65,12 @@ if %errorlevel% neq 0 (
     pip install pandas
 )
 
+python -c "import eventlet" >nul 2>&1
+if %errorlevel% neq 0 (
+    echo [信息] 正在安装eventlet（高并发服务器模式）...
+    pip install eventlet
+)
+
 REM 配置防火墙
 echo [信息] 配置防火墙规则...
 netsh advfirewall firewall show rule name="ClassroomChatSystem" >nul 2>&1
@@ -104,6 +110,6 @@ echo.
 
 REM 启动Flask应用
 cd src
-python app.py
+python app_launcher.py
 
 pause